@@ -6,6 +6,7 @@ import os
 from datetime import datetime
 import hashlib
 import logging
+from sample_questions import SAMPLE_QUESTIONS_BY_TABLE
 
 # Set up logging
 logging.basicConfig(filename='app.log', level=logging.INFO, 
@@ -19,48 +20,7 @@ CSV_FILE = 'user_interactions.csv'
 MAX_RETRIES = 3
 
 # Sample questions grouped by table
-SAMPLE_QUESTIONS = {
-    "CUSTOMERS": {
-        "Customer Demographics": [
-            "What is the distribution of customer segments?",
-            "How many customers do we have in each region?"
-        ],
-        "Customer Behavior": [
-            "Who are our most active customers?",
-            "What's the average customer lifetime value?"
-        ]
-    },
-    "ORDERS": {
-        "Order Analysis": [
-            "What is the average order value by month?",
-            "Which days of the week have the highest order volume?"
-        ],
-        "Order Trends": [
-            "What's the month-over-month order growth?",
-            "What's the distribution of order sizes?"
-        ]
-    },
-    "PRODUCTS": {
-        "Product Performance": [
-            "What are our top-selling products?",
-            "Which product categories have the highest profit margins?"
-        ],
-        "Product Analysis": [
-            "What's the price distribution across categories?",
-            "Which products are frequently bought together?"
-        ]
-    },
-    "SALES": {
-        "Sales Analysis": [
-            "What's our total revenue by product category?",
-            "Which regions have the highest sales growth?"
-        ],
-        "Sales Trends": [
-            "What's our year-over-year sales growth?",
-            "What's the seasonal pattern in our sales?"
-        ]
-    }
-}
+SAMPLE_QUESTIONS = SAMPLE_QUESTIONS_BY_TABLE
 
 # Table schemas
 TABLE_SCHEMAS = {
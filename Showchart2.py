@@ -10,6 +10,8 @@ import logging
 import uuid
 import zipfile
 import plotly.express as px
+from interaction_store import init_csv, append_records, update_feedback, new_interaction_id
+from interaction_writer import InteractionWriter
 
 # Set up logging
 logging.basicConfig(filename='app.log', level=logging.INFO, 
@@ -19,39 +21,16 @@ logging.basicConfig(filename='app.log', level=logging.INFO,
 st.set_page_config(page_title="NeuroFlake", layout="wide", initial_sidebar_state="collapsed")
 
 # Constants
-CSV_FILE = 'user_interactions.csv'
-MAX_RETRIES = 3
 MAX_ROWS_DISPLAY = 1000
 ZIP_FOLDER = "zip_downloads"
 SIZE_LIMIT_MB = 190
 
-# Initialize CSV file
-def init_csv():
-    if not os.path.exists(CSV_FILE):
-        pd.DataFrame(columns=['timestamp', 'question', 'result', 'upvote', 'downvote', 'session_id']).to_csv(CSV_FILE, index=False)
+# Initialize the background writer for the interaction log
+@st.cache_resource
+def get_interaction_writer():
+    return InteractionWriter(append_records)
 
-# Load CSV file
-@st.cache_data
-def load_data():
-    for _ in range(MAX_RETRIES):
-        try:
-            return pd.read_csv(CSV_FILE)
-        except pd.errors.EmptyDataError:
-            init_csv()
-        except Exception as e:
-            logging.error(f"Error loading CSV: {str(e)}")
-    return pd.DataFrame()
-
-# Append data to CSV
-def append_to_csv(new_data):
-    for _ in range(MAX_RETRIES):
-        try:
-            with open(CSV_FILE, 'a', newline='') as f:
-                new_data.to_csv(f, header=f.tell()==0, index=False)
-            return True
-        except Exception as e:
-            logging.error(f"Error appending to CSV: {str(e)}")
-    return False
+interaction_writer = get_interaction_writer()
 
 # Generate a session ID
 def generate_session_id():
@@ -71,8 +50,8 @@ def init_app():
         }
     if 'session_id' not in st.session_state:
         st.session_state['session_id'] = generate_session_id()
-    if 'last_question' not in st.session_state:
-        st.session_state['last_question'] = None
+    if 'last_interaction_id' not in st.session_state:
+        st.session_state['last_interaction_id'] = None
     if 'last_sql' not in st.session_state:
         st.session_state['last_sql'] = None
     if 'chart_states' not in st.session_state:
@@ -122,18 +101,20 @@ def execute_query(sql):
         'category': np.random.choice(['A', 'B', 'C', 'D'], n_rows)
     })
 
-# Handle user interaction
+# Handle user interaction; returns the id feedback on it is recorded against
 def handle_interaction(question, result):
-    new_data = pd.DataFrame({
-        'timestamp': [datetime.now()],
-        'question': [question.strip().replace('\n', ' ')],
-        'result': [result.strip().replace('\n', ' ')],
-        'upvote': [0],
-        'downvote': [0],
-        'session_id': [st.session_state['session_id']]
+    interaction_id = new_interaction_id()
+    interaction_writer.submit({
+        'interaction_id': interaction_id,
+        'timestamp': datetime.now(),
+        'question': question.strip().replace('\n', ' '),
+        'result': result.strip().replace('\n', ' '),
+        'upvote': 0,
+        'downvote': 0,
+        'session_id': st.session_state['session_id']
     })
-    append_to_csv(new_data)
-    st.session_state['last_question'] = question.strip().replace('\n', ' ')
+    st.session_state['last_interaction_id'] = interaction_id
+    return interaction_id
 
 # Generate a zip file containing the CSV file
 def generate_zip_file():
@@ -154,20 +135,6 @@ def generate_zip_file():
         return zip_file_path
     return None
 
-def update_feedback(feedback_type, question):
-    try:
-        df = pd.read_csv(CSV_FILE)
-        mask = df['question'] == question
-        if feedback_type == 'upvote':
-            df.loc[mask, 'upvote'] += 1
-        else:
-            df.loc[mask, 'downvote'] += 1
-        df.to_csv(CSV_FILE, index=False)
-        return True
-    except Exception as e:
-        logging.error(f"Error updating feedback: {str(e)}")
-        return False
-
 def process_and_display_query(question):
     # Generate unique message ID
     message_id = str(len(st.session_state.chat['history']))
@@ -273,8 +240,8 @@ def main():
 
     with button_column[1]:
         if st.button("👍 Upvote", key="upvote", use_container_width=True):
-            if st.session_state.get('last_question'):
-                if update_feedback('upvote', st.session_state['last_question']):
+            if st.session_state.get('last_interaction_id'):
+                if update_feedback('upvote', st.session_state['last_interaction_id']):
                     button_info.success("Thanks for your feedback! NeuroFlake Memory updated")
                 else:
                     button_info.error("Failed to update feedback. Please try again.")
@@ -283,8 +250,8 @@ def main():
 
     with button_column[0]:
         if st.button("👎 Downvote", key="downvote", use_container_width=True):
-            if st.session_state.get('last_question'):
-                if update_feedback('downvote', st.session_state['last_question']):
+            if st.session_state.get('last_interaction_id'):
+                if update_feedback('downvote', st.session_state['last_interaction_id']):
                     button_info.warning("We're sorry the result wasn't helpful. Your feedback will help us improve!")
                 else:
                     button_info.error("Failed to update feedback. Please try again.")
@@ -1,3 +1,5 @@
+import re
+
 def check_and_clean_columns(columns):
     has_dot = False
     cleaned_columns = []
@@ -11,16 +13,6 @@ def check_and_clean_columns(columns):
     
     return cleaned_columns, has_dot
 
-# Example usage
-column_list = ["em.rule", "user_id", "order.date", "product_name"]
-
-cleaned_columns, contains_dot = check_and_clean_columns(column_list)
-
-print("Original columns:", column_list)
-print("Cleaned columns:", cleaned_columns)
-print("Contains columns with dot:", contains_dot)
-
-
 def validate_columns(extracted_tables, extracted_columns, exception_data, rule_metadata, issue_data):
     table_column_mapping = {
         "exception_data": exception_data,
@@ -28,6 +20,10 @@ def validate_columns(extracted_tables, extracted_columns, exception_data, rule_m
         "issue_data": issue_data
     }
     
+    return validate_columns_for_schema(extracted_tables, extracted_columns, table_column_mapping)
+
+# Same check against any {table: columns} mapping
+def validate_columns_for_schema(extracted_tables, extracted_columns, table_column_mapping):
     valid_columns = set()
     for table in extracted_tables:
         if table in table_column_mapping:
@@ -40,21 +36,82 @@ def validate_columns(extracted_tables, extracted_columns, exception_data, rule_m
     else:
         return True, []
 
-# Example usage
-exception_data = ["id", "exception_type", "description"]
-rule_metadata = ["rule_id", "rule_name", "rule_type"]
-issue_data = ["issue_id", "issue_description", "status"]
+SQL_KEYWORDS = {
+    "select", "from", "where", "and", "or", "not", "in", "is", "null", "as", "on", "join",
+    "left", "right", "inner", "outer", "full", "cross", "group", "by", "order", "having",
+    "limit", "offset", "distinct", "asc", "desc", "union", "all", "case", "when", "then",
+    "else", "end", "between", "like", "ilike", "exists", "with", "true", "false", "interval",
+    "using", "over", "partition", "top", "nulls", "first", "last", "date", "day", "month",
+    "year", "quarter", "week",
+}
+
+# Pull table and column names out of a query: tables follow FROM/JOIN, columns are the
+# remaining identifiers that are not keywords, function names, aliases or literals.
+# Names a query defines itself, WITH <name> AS (...) and the alias after a subquery's
+# closing paren, are aliases rather than tables. Double-quoted text is dropped with the literals, since models write "Paris" for 'Paris'.
+# Qualified columns are cleaned with check_and_clean_columns. Names are lowercased.
+def extract_tables_and_columns(sql):
+    sql = re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"", " ", sql.lower())
+    derived = set()
+    for name, cte_columns in re.findall(r"(?:\bwith(?:\s+recursive)?|,)\s*([a-z_]\w*)\s*(?:\(([^()]*)\)\s*)?as\s*\(", sql):
+        derived.add(name)
+        derived.update(re.findall(r"[a-z_]\w*", cte_columns))
+    derived.update(name for name in re.findall(r"\)\s*(?:as\s+)?([a-z_]\w*)", sql) if name not in SQL_KEYWORDS)
+    tables = re.findall(r"\b(?:from|join)\s+([a-z_][\w.]*)", sql)
+    tables = [table.split('.')[-1] for table in tables if table not in derived]
+    aliases = set(re.findall(r"\bas\s+([a-z_]\w*)", sql)) | derived
+    aliases.update(re.findall(r"\b(?:from|join)\s+[a-z_][\w.]*\s+(?!as\b|on\b|where\b|join\b|left\b|right\b|inner\b|group\b|order\b|limit\b)([a-z_]\w*)", sql))
+
+    columns = []
+    for match in re.finditer(r"\b([a-z_][\w]*(?:\.[a-z_*][\w]*)?)\b(\s*\()?", sql):
+        name, is_call = match.group(1), match.group(2)
+        if is_call or name in SQL_KEYWORDS or name in aliases or name.split('.')[-1] in tables:
+            continue
+        if name.endswith('.*') or name.split('.')[-1] in aliases:
+            continue
+        columns.append(name)
 
-# Replace these with your actual extracted data
-extracted_tables = ["exception_data", "rule_metadata"]
-extracted_columns = ["id", "rule_id", "description", "status"]
+    cleaned_columns, _ = check_and_clean_columns(columns)
+    return sorted(set(tables)), sorted(set(cleaned_columns) - aliases)
 
-is_valid, invalid_cols = validate_columns(extracted_tables, extracted_columns, 
-                                          exception_data, rule_metadata, issue_data)
+# Check a query against a {table: {column: type}} schema: every table it reads must
+# exist and every column must belong to one of those tables. Returns (is_valid, names),
+# names being the unknown tables followed by the unknown columns.
+def validate_sql_for_schema(sql, table_schemas):
+    tables, columns = extract_tables_and_columns(sql)
+    table_column_mapping = {table.lower(): [column.lower() for column in table_columns]
+                            for table, table_columns in table_schemas.items()}
+    unknown_tables = [table for table in tables if table not in table_column_mapping]
+    is_valid, invalid_columns = validate_columns_for_schema(tables, columns, table_column_mapping)
+    if unknown_tables:
+        return False, unknown_tables + invalid_columns
+    return is_valid, invalid_columns
 
-if is_valid:
-    print("All extracted columns belong to at least one of the extracted tables.")
-    # Proceed with your data processing here
-else:
-    print("No data matched.")
-    print("The following columns do not belong to any of the extracted tables:", invalid_cols)
+if __name__ == "__main__":
+    # Example usage
+    column_list = ["em.rule", "user_id", "order.date", "product_name"]
+
+    cleaned_columns, contains_dot = check_and_clean_columns(column_list)
+
+    print("Original columns:", column_list)
+    print("Cleaned columns:", cleaned_columns)
+    print("Contains columns with dot:", contains_dot)
+
+    # Example usage
+    exception_data = ["id", "exception_type", "description"]
+    rule_metadata = ["rule_id", "rule_name", "rule_type"]
+    issue_data = ["issue_id", "issue_description", "status"]
+
+    # Replace these with your actual extracted data
+    extracted_tables = ["exception_data", "rule_metadata"]
+    extracted_columns = ["id", "rule_id", "description", "status"]
+
+    is_valid, invalid_cols = validate_columns(extracted_tables, extracted_columns, 
+                                              exception_data, rule_metadata, issue_data)
+
+    if is_valid:
+        print("All extracted columns belong to at least one of the extracted tables.")
+        # Proceed with your data processing here
+    else:
+        print("No data matched.")
+        print("The following columns do not belong to any of the extracted tables:", invalid_cols)
@@ -0,0 +1,158 @@
+import threading
+import heapq
+import itertools
+import time
+import logging
+from collections import Counter
+from concurrent.futures import Future
+
+# Priority classes, most urgent first: typed questions, sample-question clicks, and
+# bulk or background callers such as precomputation jobs
+INTERACTIVE = 0
+SAMPLE = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", SAMPLE: "sample", BACKGROUND: "background"}
+
+# Largest fraction of each batch a class may fill while other work is waiting; every
+# class always gets at least one slot
+CLASS_SHARES = {INTERACTIVE: 1.0, SAMPLE: 0.5, BACKGROUND: 0.25}
+
+# Collects questions from every Streamlit session and decodes them together.
+# Each batch is filled in priority order, with at most max_per_session requests from
+# one session and at most its class share of slots for each class. Slots still free when
+# the wait window closes go to requests held back by their class share, so the shares
+# only bind under contention; whatever does not fit waits for the next batch.
+# Sampled and greedy requests need different decode options and never share a batch.
+class BatchScheduler:
+    def __init__(self, generate_batch, max_batch_size=8, max_wait_ms=20, max_per_session=2, class_shares=CLASS_SHARES):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_per_session = max_per_session
+        self.class_limits = {priority: max(1, int(share * max_batch_size)) for priority, share in class_shares.items()}
+        self._heap = []
+        self._order = itertools.count()
+        self._ready = threading.Condition()
+        self._submitted = Counter()
+        self._decoded = Counter()
+        self._wait_seconds = Counter()
+        self._batches = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sql-batch-scheduler", daemon=True)
+        self._thread.start()
+        logging.info(f"Batch scheduler started (max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}, "
+                     f"max_per_session={max_per_session})")
+
+    # Queue a question and return a Future resolving to its SQL.
+    # on_token(token_id) is called as tokens are decoded; returning True stops this request.
+    # Requests without a session_id are not subject to the per-session limit.
+    # context is handed through to generate_batch with the question; sample=True asks for
+    # a sampled rather than greedy decode.
+    def submit(self, user_input, on_token=None, priority=INTERACTIVE, session_id=None, context=None, sample=False):
+        future = Future()
+        request = (user_input, future, on_token, priority, session_id, time.monotonic(), context, sample)
+        with self._ready:
+            if self._closed:
+                raise RuntimeError("Batch scheduler is closed")
+            heapq.heappush(self._heap, (priority, next(self._order), request))
+            self._submitted[priority] += 1
+            self._ready.notify()
+        return future
+
+    # Stop taking requests; the thread exits once those already queued are decoded.
+    # With wait=True, block until it has (or until timeout seconds have passed).
+    def close(self, wait=False, timeout=None):
+        with self._ready:
+            self._closed = True
+            self._ready.notify()
+        if wait:
+            self._thread.join(timeout)
+
+    # Queue depth per class and totals since start
+    def metrics(self):
+        with self._ready:
+            depth = Counter(priority for priority, _, _ in self._heap)
+            return {
+                "batches": self._batches,
+                "classes": {
+                    name: {
+                        "queued": depth[priority],
+                        "submitted": self._submitted[priority],
+                        "decoded": self._decoded[priority],
+                        "mean_wait_ms": round(1000 * self._wait_seconds[priority] / max(self._decoded[priority], 1), 1),
+                    }
+                    for priority, name in PRIORITY_NAMES.items()
+                },
+            }
+
+    # Move queued requests into the batch in priority order, skipping those over a limit
+    # or with a different decode mode than the batch's first request
+    def _fill(self, batch, enforce_shares=True):
+        per_class = Counter(request[3] for request in batch)
+        per_session = Counter(request[4] for request in batch if request[4] is not None)
+        skipped = []
+        while self._heap and len(batch) < self.max_batch_size:
+            entry = heapq.heappop(self._heap)
+            _, _, _, priority, session_id, _, _, sample = request = entry[2]
+            if ((batch and sample != batch[0][7])
+                    or (enforce_shares and per_class[priority] >= self.class_limits.get(priority, self.max_batch_size))
+                    or (session_id is not None and per_session[session_id] >= self.max_per_session)):
+                skipped.append(entry)
+                continue
+            batch.append(request)
+            per_class[priority] += 1
+            if session_id is not None:
+                per_session[session_id] += 1
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+
+    # Block for the first request, then gather whatever arrives within the window.
+    # Returns None once the scheduler is closed and drained.
+    def _collect(self):
+        with self._ready:
+            while not self._heap:
+                if self._closed:
+                    return None
+                self._ready.wait()
+            deadline = time.monotonic() + self.max_wait
+            batch = []
+            while True:
+                self._fill(batch)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+            self._fill(batch, enforce_shares=False)
+            queued = len(self._heap)
+        if queued:
+            logging.info(f"{queued} requests left queued after filling a batch of {len(batch)}")
+        return batch
+
+    def _run(self):
+        while True:
+            collected = self._collect()
+            if collected is None:
+                logging.info("Batch scheduler stopped")
+                return
+            batch = [request for request in collected if request[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            with self._ready:
+                self._batches += 1
+                for _, _, _, priority, _, enqueued_at, _, _ in batch:
+                    self._decoded[priority] += 1
+                    self._wait_seconds[priority] += started - enqueued_at
+            try:
+                outputs = self.generate_batch([request[0] for request in batch],
+                                              [request[2] for request in batch],
+                                              [request[6] for request in batch],
+                                              sample=batch[0][7])
+            except Exception as e:
+                logging.error(f"Error decoding batch of {len(batch)}: {str(e)}")
+                for request in batch:
+                    request[1].set_exception(e)
+                continue
+            logging.info(f"Decoded batch of {len(batch)} questions")
+            for request, output in zip(batch, outputs):
+                request[1].set_result(output)
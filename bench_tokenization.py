@@ -0,0 +1,83 @@
+import argparse
+import time
+import transformers
+from sql_generator import TABLE_SCHEMAS
+from prompt_builder import SYSTEM_MESSAGE, PromptBuilder, PromptTemplate, default_template, render_ddl
+
+# Micro-benchmark: per-request prompt tokenization, old round trip vs. compiled prompt
+QUESTIONS = [
+    "How many stadiums are there",
+    "What is the average capacity of all stadiums",
+    "Which stadium has the highest attendance",
+    "List the singers who performed in concert 3",
+    "Show the location and name of stadiums with capacity above 10000",
+]
+
+# What generate_sql did before: render the template, encode, map ids back to tokens
+# and look up the terminators on every request
+def legacy_tokens(tokenizer, user_input):
+    prompt = f"""
+{render_ddl(TABLE_SCHEMAS)}
+
+-- Using valid SQLite, answer the following questions for the tables provided above.
+
+-- {user_input} ? (Generate 1 Sql query. No explanation needed)
+
+answer:
+            """
+
+    messages = [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt},
+    ]
+
+    input_ids = tokenizer.apply_chat_template(
+        messages, 
+        tokenize=False, 
+        add_generation_prompt=True
+    )
+    terminators = [
+        tokenizer.eos_token_id,
+        tokenizer.convert_tokens_to_ids("<|eot_id|>")
+    ]
+    return tokenizer.convert_ids_to_tokens(tokenizer.encode(input_ids)), terminators
+
+def compiled_tokens(builder, user_input):
+    prompt = builder.compile(TABLE_SCHEMAS)
+    return prompt.static_tokens + prompt.question_tokens(user_input), builder.terminators
+
+# Reference tokens for the compiled path: the whole rendered prompt encoded in one go
+def rendered_tokens(tokenizer, builder, user_input):
+    text = builder.render(TABLE_SCHEMAS, user_input)
+    if tokenizer.bos_token and text.startswith(tokenizer.bos_token):
+        text = text[len(tokenizer.bos_token):]
+    return tokenizer.convert_ids_to_tokens(tokenizer.encode(text))
+
+def time_per_request(fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(QUESTIONS[i % len(QUESTIONS)])
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-request prompt tokenization cost")
+    parser.add_argument("--model-dir", default="./llama3_8b_ct2")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--prompt-template", help="template file such as Prompt.txt; the inline prompt by default")
+    args = parser.parse_args()
+
+    tokenizer = transformers.AutoTokenizer.from_pretrained(args.model_dir)
+    template = PromptTemplate.from_file(args.prompt_template) if args.prompt_template else default_template(tokenizer)
+    builder = PromptBuilder(tokenizer, template)
+
+    mismatches = sum(rendered_tokens(tokenizer, builder, q) != compiled_tokens(builder, q)[0] for q in QUESTIONS)
+    legacy = time_per_request(lambda q: legacy_tokens(tokenizer, q), args.iterations)
+    compiled = time_per_request(lambda q: compiled_tokens(builder, q), args.iterations)
+
+    print(f"legacy round trip : {legacy * 1e6:9.1f} us/request")
+    print(f"compiled prompt   : {compiled * 1e6:9.1f} us/request")
+    print(f"saved             : {(legacy - compiled) * 1e6:9.1f} us/request ({legacy / compiled:.1f}x)")
+    print(f"token mismatches  : {mismatches}/{len(QUESTIONS)}")
+
+if __name__ == "__main__":
+    main()
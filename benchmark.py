@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+from sql_generator import SQLGenerator
+
+# Fixed corpus so runs are comparable
+BENCHMARK_QUESTIONS = [
+    "How many stadiums are there",
+    "What is the average capacity of all stadiums",
+    "Which stadium has the highest attendance",
+    "List the name and location of every stadium",
+    "How many concerts were held in each stadium",
+    "Show the stadium with the lowest average attendance",
+    "Which singers performed in more than one concert",
+    "What is the total capacity of stadiums in each location",
+]
+
+# Character-level stand-in for the Llama-3 tokenizer, enough for SQLGenerator's prompt path
+class StubTokenizer:
+    eos_token_id = 0
+    eot_token_id = 1
+    bos_token = "<|begin_of_text|>"
+
+    def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=True):
+        text = self.bos_token
+        for message in messages:
+            text += f"<|start_header_id|>{message['role']}<|end_header_id|>\n\n{message['content']}<|eot_id|>"
+        if add_generation_prompt:
+            text += "<|start_header_id|>assistant<|end_header_id|>\n\n"
+        return text
+
+    def encode(self, text, add_special_tokens=True):
+        return ([2] if add_special_tokens else []) + [ord(ch) + 3 for ch in text]
+
+    def tokenize(self, text):
+        return list(text)
+
+    def convert_ids_to_tokens(self, ids):
+        return [chr(i - 3) if i > 2 else "" for i in ids]
+
+    def convert_tokens_to_ids(self, token):
+        return self.eot_token_id if token == "<|eot_id|>" else ord(token) + 3
+
+    def convert_tokens_to_string(self, tokens):
+        return "".join(tokens)
+
+    def decode(self, ids, skip_special_tokens=False):
+        return "".join(chr(i - 3) for i in ids if i > 2)
+
+class StubStepResult:
+    def __init__(self, batch_id, token_id, token):
+        self.batch_id = batch_id
+        self.token_id = token_id
+        self.token = token
+
+class StubGenerationResult:
+    def __init__(self, sequences_ids):
+        self.sequences_ids = [sequences_ids]
+
+# Stand-in for ctranslate2.Generator with a simple cost model: prefill time per prompt
+# token (the static prompt is free once cached) and decode time per step plus per
+# sequence in the batch. It always answers with the same query.
+class StubModel:
+    def __init__(self, prefill_us_per_token=20, step_ms=4.0, step_ms_per_sequence=0.5,
+                 output="SELECT name, capacity FROM stadium ORDER BY capacity DESC;"):
+        self.prefill_us_per_token = prefill_us_per_token
+        self.step_ms = step_ms
+        self.step_ms_per_sequence = step_ms_per_sequence
+        self.output_ids = [ord(ch) + 3 for ch in output]
+        self._cached_static_prompts = set()
+
+    def _prefill(self, inputs, static_prompt):
+        tokens = sum(len(tokens) for tokens in inputs)
+        if static_prompt is not None and tuple(static_prompt) not in self._cached_static_prompts:
+            self._cached_static_prompts.add(tuple(static_prompt))
+            tokens += len(static_prompt)
+        time.sleep(tokens * self.prefill_us_per_token / 1e6)
+
+    def generate_batch(self, inputs, static_prompt=None, callback=None, max_length=256, **kwargs):
+        self._prefill(inputs, static_prompt)
+        outputs = [[] for _ in inputs]
+        active = set(range(len(inputs)))
+        for step in range(min(max_length, len(self.output_ids))):
+            if not active:
+                break
+            time.sleep((self.step_ms + self.step_ms_per_sequence * len(active)) / 1000)
+            token_id = self.output_ids[step]
+            for batch_id in sorted(active):
+                outputs[batch_id].append(token_id)
+                if callback and callback(StubStepResult(batch_id, token_id, chr(token_id - 3))):
+                    active.discard(batch_id)
+        return [StubGenerationResult(ids) for ids in outputs]
+
+    def generate_tokens(self, prompt, static_prompt=None, max_length=256, **kwargs):
+        self._prefill([prompt], static_prompt)
+        for token_id in self.output_ids[:max_length]:
+            time.sleep((self.step_ms + self.step_ms_per_sequence) / 1000)
+            yield StubStepResult(0, token_id, chr(token_id - 3))
+
+# Nearest-rank percentile
+def percentile(values, p):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+# Decode the corpus in batches and collect per-request timings
+def run_config(generator, batch_size, repeats):
+    latencies, prefills, decode_rates = [], [], []
+    questions = BENCHMARK_QUESTIONS * repeats
+    for i in range(0, len(questions), batch_size):
+        batch = questions[i:i + batch_size]
+        first_token_at = [None] * len(batch)
+        token_counts = [0] * len(batch)
+
+        def on_token_for(index):
+            def on_token(token_id):
+                if first_token_at[index] is None:
+                    first_token_at[index] = time.perf_counter()
+                token_counts[index] += 1
+                return False
+            return on_token
+
+        start = time.perf_counter()
+        generator.generate_sql_batch(batch, [on_token_for(index) for index in range(len(batch))])
+        end = time.perf_counter()
+
+        for index in range(len(batch)):
+            latencies.append(end - start)
+            if first_token_at[index] is not None:
+                prefills.append(first_token_at[index] - start)
+                if token_counts[index] > 1 and end > first_token_at[index]:
+                    decode_rates.append((token_counts[index] - 1) / (end - first_token_at[index]))
+
+    return {
+        "requests": len(latencies),
+        "prefill_ms_mean": round(1000 * sum(prefills) / max(len(prefills), 1), 2),
+        "decode_tokens_per_second": round(sum(decode_rates) / max(len(decode_rates), 1), 1),
+        "latency_ms": {
+            "p50": round(1000 * percentile(latencies, 50), 2),
+            "p95": round(1000 * percentile(latencies, 95), 2),
+            "p99": round(1000 * percentile(latencies, 99), 2),
+        },
+    }
+
+def config_key(result):
+    return (result["compute_type"], result["inter_threads"], result["intra_threads"], result["batch_size"])
+
+# Compare against a stored run; returns the configs that regressed beyond max_regression
+def compare(results, baseline, max_regression):
+    baseline_by_key = {config_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get(config_key(result))
+        if previous is None:
+            continue
+        p95_change = result["latency_ms"]["p95"] / previous["latency_ms"]["p95"] - 1
+        rate_change = result["decode_tokens_per_second"] / max(previous["decode_tokens_per_second"], 1e-9) - 1
+        print(f"{config_key(result)}: p95 {p95_change:+.1%}, decode tokens/s {rate_change:+.1%}")
+        if p95_change > max_regression or rate_change < -max_regression:
+            regressions.append(config_key(result))
+    return regressions
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(",") if item]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLGenerator latency and throughput")
+    parser.add_argument("--model-dir", default="./llama3_8b_ct2")
+    parser.add_argument("--stub", action="store_true", help="use the stub model and tokenizer instead of the weights")
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--threads", default=f"1x{os.cpu_count()}", help="inter x intra thread layouts, e.g. 1x8,2x4")
+    parser.add_argument("--compute-types", default="int8")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = []
+    for compute_type in parse_list(args.compute_types):
+        for layout in parse_list(args.threads):
+            inter_threads, intra_threads = (int(n) for n in layout.split("x"))
+            profile = {"compute_type": compute_type, "inter_threads": inter_threads,
+                       "intra_threads": intra_threads, "max_batch_size": 0}
+            stubs = dict(model=StubModel(), tokenizer=StubTokenizer()) if args.stub else {}
+            generator = SQLGenerator(model_id=args.model_dir, profile=profile, batching=False, **stubs)
+            # Warm-up decode so loading and the static prompt cache are not measured
+            generator.generate_sql_batch(BENCHMARK_QUESTIONS[:1])
+            for batch_size in parse_list(args.batch_sizes, int):
+                result = dict(profile, batch_size=batch_size, **run_config(generator, batch_size, args.repeats))
+                print(json.dumps(result))
+                results.append(result)
+            del generator
+
+    with open(args.output, "w") as f:
+        json.dump({"created_at": datetime.now().isoformat(), "stub": args.stub, "results": results}, f, indent=2)
+    logging.info(f"Benchmark results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"Regressed beyond {args.max_regression:.0%}: {regressions}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import threading
+import logging
+
+# Tokens of earlier turns carried into a follow-up question
+HISTORY_TOKEN_BUDGET = 384
+MAX_TURNS = 6
+
+# Lines spliced into the prompt's question slot ahead of a follow-up question
+CONTEXT_OPENER = "Context from earlier in the conversation:\n--"
+FOLLOW_UP_LABEL = " Follow-up question:"
+
+# Earlier questions and SQL of one session, for follow-up questions.
+# Every turn is tokenized once when it is first used and the tokens are kept, so a
+# follow-up only tokenizes its own question. Turns that do not fit token_budget are
+# shortened to their question, then dropped, oldest first.
+class ConversationContext:
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, max_turns=MAX_TURNS):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.turns = []
+        self._tokenizer = None
+        self._turn_tokens = []
+        self._fixed_tokens = {}
+        self._lock = threading.Lock()
+
+    # Rebuild a context from (question, sql) pairs, as sent to the model server
+    @classmethod
+    def from_turns(cls, turns, **kwargs):
+        context = cls(**kwargs)
+        for question, sql in turns:
+            context.add(question, sql)
+        return context
+
+    def add(self, question, sql):
+        with self._lock:
+            self.turns.append((" ".join(question.split()), " ".join(sql.split())))
+            self._turn_tokens.append(None)
+            if len(self.turns) > self.max_turns:
+                self.turns.pop(0)
+                self._turn_tokens.pop(0)
+
+    def clear(self):
+        with self._lock:
+            self.turns = []
+            self._turn_tokens = []
+
+    # Earlier questions, to pick the tables a follow-up refers to
+    def retrieval_text(self):
+        return " ".join(question for question, _ in self.turns)
+
+    # (full, question-only) tokens of a turn, tokenized on first use
+    def _tokens_for_turn(self, tokenizer, i):
+        if self._turn_tokens[i] is None:
+            question, sql = self.turns[i]
+            self._turn_tokens[i] = (tokenizer.tokenize(f" Earlier question: {question}\n-- Earlier SQL: {sql}\n--"),
+                                    tokenizer.tokenize(f" Earlier question: {question}\n--"))
+        return self._turn_tokens[i]
+
+    # Tokens that go between the slot's lead character and the follow-up question
+    def tokens(self, tokenizer, lead):
+        with self._lock:
+            if not self.turns:
+                return []
+            if tokenizer is not self._tokenizer:
+                self._tokenizer = tokenizer
+                self._turn_tokens = [None] * len(self.turns)
+                self._fixed_tokens = {}
+            fitted = []
+            remaining = self.token_budget
+            for i in reversed(range(len(self.turns))):
+                full, short = self._tokens_for_turn(tokenizer, i)
+                turn_tokens = full if len(full) <= remaining else short
+                if len(turn_tokens) > remaining:
+                    logging.info(f"Follow-up context truncated to {len(self.turns) - 1 - i} of {len(self.turns)} turns")
+                    break
+                fitted.insert(0, turn_tokens)
+                remaining -= len(turn_tokens)
+            if lead not in self._fixed_tokens:
+                self._fixed_tokens[lead] = (tokenizer.tokenize(lead + CONTEXT_OPENER),
+                                            tokenizer.tokenize(FOLLOW_UP_LABEL))
+            opener, label = self._fixed_tokens[lead]
+            return opener + [token for turn_tokens in fitted for token in turn_tokens] + label
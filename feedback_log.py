@@ -0,0 +1,215 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+
+FEEDBACK_LOG_FILE = 'feedback_events.jsonl'
+FEEDBACK_SNAPSHOT_FILE = 'feedback_counts.json'
+COMPACT_SECONDS = 30
+# A compaction lock older than this is left over from a crashed process
+STALE_LOCK_SECONDS = 120
+# Segments are folded only once they are this old, so a write another process opened
+# on the live log just before the rename has landed in the segment before it is read
+SEGMENT_GRACE_SECONDS = 5
+FEEDBACK_TYPES = ('upvote', 'downvote')
+
+def _add(counts, interaction_id, feedback_type, amount=1):
+    entry = counts.setdefault(interaction_id, {'upvote': 0, 'downvote': 0})
+    entry[feedback_type] += amount
+
+# Take a lock shared by every process by creating path exclusively; False if another
+# process holds it. A lock older than stale_seconds is removed so the next try succeeds.
+def acquire_lock_file(path, stale_seconds=STALE_LOCK_SECONDS):
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(path) > stale_seconds:
+                os.remove(path)
+        except OSError:
+            pass
+        return False
+
+# Votes from complete lines of an event log segment
+def _parse(lines, counts):
+    for line in lines:
+        try:
+            event = json.loads(line)
+            _add(counts, event['interaction_id'], event['type'])
+        except (ValueError, KeyError) as e:
+            logging.warning(f"Skipping malformed feedback event: {str(e)}")
+
+# Feedback recorded as append-only events, so a vote is one small append however long
+# the history is and concurrent sessions cannot overwrite each other's votes.
+# The compactor renames the live log to a segment named by the rename time, and folds
+# segments renamed at least grace_seconds ago into the per-interaction counters in the
+# snapshot (recording them as applied) before deleting them. counts() is the snapshot
+# plus any unapplied segments plus the live log, which is tailed incrementally and kept
+# in memory as a delta.
+class FeedbackLog:
+    def __init__(self, path=FEEDBACK_LOG_FILE, snapshot_path=FEEDBACK_SNAPSHOT_FILE, compact_seconds=COMPACT_SECONDS,
+                 grace_seconds=SEGMENT_GRACE_SECONDS):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.compact_seconds = compact_seconds
+        self.grace_seconds = grace_seconds
+        self.lock_path = path + '.lock'
+        self.events_written = 0
+        self.compactions = 0
+        self._snapshot = {'counts': {}, 'applied': []}
+        self._snapshot_mtime = None
+        self._delta = {}
+        self._offset = 0
+        self._inode = None
+        self._head = b''
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._thread = None
+
+    # Start compacting in the background every compact_seconds
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="feedback-compactor", daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, interaction_id, feedback_type):
+        if feedback_type not in FEEDBACK_TYPES:
+            raise ValueError(f"Unknown feedback type: {feedback_type}")
+        line = json.dumps({'interaction_id': interaction_id, 'type': feedback_type, 'timestamp': time.time()}) + '\n'
+        with self._write_lock:
+            # O_APPEND keeps each line intact when several processes write the same log
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+            self.events_written += 1
+
+    def _load_snapshot(self):
+        try:
+            mtime = os.path.getmtime(self.snapshot_path)
+        except OSError:
+            return self._snapshot
+        if mtime != self._snapshot_mtime:
+            with open(self.snapshot_path) as f:
+                self._snapshot = json.load(f)
+            self._snapshot_mtime = mtime
+        return self._snapshot
+
+    # Whether the live log still starts with the first line read from it. Inodes are
+    # reused once segments are deleted, so a recreated log can carry the old inode.
+    def _same_log(self):
+        if not self._head:
+            return True
+        with open(self.path, 'rb') as f:
+            return f.read(len(self._head)) == self._head
+
+    # Read events appended to the live log since the last call into the delta
+    def _tail(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._delta, self._offset, self._inode, self._head = {}, 0, None, b''
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset or not self._same_log():
+            # The log was compacted away; its events are now in a segment or the snapshot
+            self._delta, self._offset, self._inode, self._head = {}, 0, stat.st_ino, b''
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(stat.st_size - self._offset)
+        complete = data.rfind(b'\n') + 1
+        if self._offset == 0:
+            self._head = data[:data.find(b'\n') + 1]
+        _parse(data[:complete].decode().splitlines(), self._delta)
+        self._offset += complete
+
+    def _segments(self):
+        return sorted(glob.glob(self.path + '.*.segment'))
+
+    # Seconds since a segment was renamed, from the millisecond time in its name
+    def _segment_age(self, segment):
+        try:
+            renamed_ms = int(os.path.basename(segment)[len(os.path.basename(self.path)) + 1:].split('-')[0])
+        except ValueError:
+            return float('inf')
+        return time.time() - renamed_ms / 1000.0
+
+    # {interaction_id: {'upvote': n, 'downvote': n}}
+    def counts(self):
+        with self._read_lock:
+            try:
+                snapshot = self._load_snapshot()
+                self._tail()
+                counts = {interaction_id: dict(entry) for interaction_id, entry in snapshot['counts'].items()}
+                pending = {}
+                for segment in self._segments():
+                    if os.path.basename(segment) not in snapshot['applied']:
+                        try:
+                            with open(segment) as f:
+                                _parse(f.read().splitlines(), pending)
+                        except FileNotFoundError:
+                            pass  # Folded and removed by a compaction that just finished
+                for delta in (pending, self._delta):
+                    for interaction_id, entry in delta.items():
+                        for feedback_type, amount in entry.items():
+                            _add(counts, interaction_id, feedback_type, amount)
+                return counts
+            except Exception as e:
+                logging.error(f"Error reading feedback counts: {str(e)}")
+                return {}
+
+    # Fold the live log into the snapshot; returns the number of events folded
+    def compact(self):
+        if not acquire_lock_file(self.lock_path):
+            return 0
+        try:
+            # record() in this process opens and writes under the same lock, so none of
+            # its votes can land in the segment after the rename
+            with self._write_lock:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                    os.replace(self.path, f"{self.path}.{int(time.time() * 1000):015d}-{uuid.uuid4().hex[:8]}.segment")
+            # Segments renamed this cycle wait for the next one
+            segments = [segment for segment in self._segments() if self._segment_age(segment) >= self.grace_seconds]
+            if not segments:
+                return 0
+            with self._read_lock:
+                snapshot = json.loads(json.dumps(self._load_snapshot()))
+            folded = {}
+            applied = []
+            for segment in segments:
+                name = os.path.basename(segment)
+                if name not in snapshot['applied']:
+                    with open(segment) as f:
+                        _parse(f.read().splitlines(), folded)
+                applied.append(name)
+            for interaction_id, entry in folded.items():
+                for feedback_type, amount in entry.items():
+                    _add(snapshot['counts'], interaction_id, feedback_type, amount)
+            snapshot['applied'] = applied
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+            for segment in segments:
+                os.remove(segment)
+            self.compactions += 1
+            events = sum(sum(entry.values()) for entry in folded.values())
+            logging.info(f"Compacted {events} feedback events from {len(segments)} segments")
+            return events
+        except Exception as e:
+            logging.error(f"Error compacting feedback log: {str(e)}")
+            return 0
+        finally:
+            os.remove(self.lock_path)
+
+    def _run(self):
+        while True:
+            time.sleep(self.compact_seconds)
+            self.compact()
@@ -0,0 +1,118 @@
+import ctranslate2
+import argparse
+import json
+import math
+import os
+import time
+import logging
+from datetime import datetime
+
+PROFILE_FILE = 'inference_profile.json'
+COMPUTE_TYPES = ["int8", "int8_float32", "float32"]
+
+# Used when no profile has been saved and tuning is off
+DEFAULT_PROFILE = {
+    "compute_type": "int8",
+    "inter_threads": 1,
+    "intra_threads": 0,
+    "max_batch_size": 0,
+}
+
+# (inter_threads, intra_threads) splits of the host cores worth trying
+def thread_layouts(cpu_count, batch_size):
+    layouts = []
+    inter_threads = 1
+    while inter_threads <= min(cpu_count, batch_size):
+        layouts.append((inter_threads, cpu_count // inter_threads))
+        inter_threads *= 2
+    return layouts
+
+def _profile_path(model_dir):
+    return os.path.join(model_dir, PROFILE_FILE)
+
+# Load the saved profile, or None if it is missing or was tuned on a different host size
+def load_profile(model_dir):
+    path = _profile_path(model_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"Error reading inference profile {path}: {str(e)}")
+        return None
+    if profile.get("cpu_count") != os.cpu_count():
+        logging.warning(f"Inference profile {path} was tuned for {profile.get('cpu_count')} cores, host has {os.cpu_count()}")
+        return None
+    return profile
+
+def save_profile(model_dir, profile):
+    try:
+        with open(_profile_path(model_dir), 'w') as f:
+            json.dump(profile, f, indent=2)
+        logging.info(f"Saved inference profile to {_profile_path(model_dir)}: {profile}")
+    except OSError as e:
+        logging.error(f"Error saving inference profile: {str(e)}")
+
+# Decode a batch of the sample prompt under every compute type and thread layout
+# and return the profile with the highest generated tokens per second
+def tune_profile(model_dir, prompt_tokens, end_token=None, batch_size=8, max_length=32):
+    cpu_count = os.cpu_count()
+    best = None
+    for compute_type in COMPUTE_TYPES:
+        for inter_threads, intra_threads in thread_layouts(cpu_count, batch_size):
+            # Split the batch so every inter thread gets a share to decode in parallel
+            max_batch_size = math.ceil(batch_size / inter_threads)
+            try:
+                model = ctranslate2.Generator(model_dir, device="cpu", compute_type=compute_type,
+                                              inter_threads=inter_threads, intra_threads=intra_threads)
+                # Warm-up so allocation and first-touch costs are not measured
+                model.generate_batch([prompt_tokens], max_length=4, end_token=end_token)
+                start = time.perf_counter()
+                results = model.generate_batch([prompt_tokens] * batch_size, max_batch_size=max_batch_size,
+                                               max_length=max_length, end_token=end_token,
+                                               include_prompt_in_result=False)
+                elapsed = time.perf_counter() - start
+                del model
+            except Exception as e:
+                logging.warning(f"Skipping {compute_type} with {inter_threads}x{intra_threads} threads: {str(e)}")
+                continue
+
+            tokens = sum(len(result.sequences_ids[0]) for result in results)
+            tokens_per_second = tokens / elapsed
+            logging.info(f"{compute_type} with {inter_threads}x{intra_threads} threads: {tokens_per_second:.1f} tokens/s")
+            if best is None or tokens_per_second > best["tokens_per_second"]:
+                best = {
+                    "compute_type": compute_type,
+                    "inter_threads": inter_threads,
+                    "intra_threads": intra_threads,
+                    "max_batch_size": max_batch_size,
+                    "tokens_per_second": round(tokens_per_second, 1),
+                    "cpu_count": cpu_count,
+                    "tuned_at": datetime.now().isoformat(),
+                }
+
+    if best is None:
+        raise RuntimeError("No compute type and thread layout could be benchmarked")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune and save the CPU inference profile for SQLGenerator")
+    parser.add_argument("--model-dir", default="./llama3_8b_ct2")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    # Imported here since sql_generator itself imports this module
+    import transformers
+    from sql_generator import TABLE_SCHEMAS, TUNING_QUESTION
+    from prompt_builder import PromptBuilder, default_template
+    tokenizer = transformers.AutoTokenizer.from_pretrained(args.model_dir)
+    builder = PromptBuilder(tokenizer, default_template(tokenizer))
+    prompt = builder.compile(TABLE_SCHEMAS)
+    profile = tune_profile(args.model_dir, prompt.static_tokens + prompt.question_tokens(TUNING_QUESTION),
+                           builder.terminators, args.batch_size)
+    save_profile(args.model_dir, profile)
+    print(json.dumps(profile, indent=2))
+
+if __name__ == "__main__":
+    main()
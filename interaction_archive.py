@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+import logging
+from datetime import date, datetime, timedelta
+import pandas as pd
+import interaction_store
+from feedback_log import acquire_lock_file
+
+ARCHIVE_DIR = 'interaction_archive'
+ROLL_SECONDS = 3600
+# A roll lock older than this is left over from a crashed process
+STALE_ROLL_LOCK_SECONDS = 1800
+
+def _day(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+def _next_day(day):
+    return (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+# Interaction history as one directory of zstd Parquet files per day
+# (interaction_archive/date=YYYY-MM-DD/part-<first rowid>-<last rowid>.parquet), with
+# today's rows kept in the SQLite store as the hot tail. roll_over() moves every
+# finished day out of SQLite; part files are named by the rows they hold, so a roll
+# interrupted before the delete rewrites the same file rather than duplicating rows.
+# Rowids are AUTOINCREMENT and a part file that already exists is merged with rather
+# than replaced, deduplicated on interaction_id. Every frontend process runs an
+# archiver, so a roll holds a lock file in the archive directory.
+# load_data() opens only the partitions in the requested date range and reads only
+# the requested columns.
+class InteractionArchive:
+    def __init__(self, root=ARCHIVE_DIR, roll_seconds=ROLL_SECONDS):
+        self.root = root
+        self.roll_seconds = roll_seconds
+        self._lock = threading.Lock()
+        self.lock_path = os.path.join(root, '.roll.lock')
+        self._thread = None
+        os.makedirs(root, exist_ok=True)
+
+    # Roll over now and then every roll_seconds in the background
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="interaction-archiver", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self.roll_over()
+            except Exception as e:
+                logging.error(f"Error archiving interactions: {str(e)}")
+            time.sleep(self.roll_seconds)
+
+    def _partition(self, day):
+        return os.path.join(self.root, f"date={day}")
+
+    # Move the rows of every day before today from the store into Parquet partitions
+    def roll_over(self, today=None):
+        today = _day(today or date.today())
+        archived = 0
+        with self._lock:
+            if not acquire_lock_file(self.lock_path, STALE_ROLL_LOCK_SECONDS):
+                logging.info("Interaction archive is being rolled over by another process")
+                return 0
+            try:
+                for day in interaction_store.days_before(today):
+                    next_day = _next_day(day)
+                    data, first, last = interaction_store.load_day(day, next_day)
+                    if data.empty:
+                        continue
+                    data['timestamp'] = pd.to_datetime(data['timestamp'], errors='coerce')
+                    partition = self._partition(day)
+                    os.makedirs(partition, exist_ok=True)
+                    path = os.path.join(partition, f"part-{first:012d}-{last:012d}.parquet")
+                    rows = len(data)
+                    if os.path.exists(path):
+                        existing = pd.read_parquet(path)
+                        data = pd.concat([existing, data], ignore_index=True).drop_duplicates('interaction_id')
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    data.to_parquet(tmp_path, compression='zstd', index=False)
+                    os.replace(tmp_path, path)
+                    interaction_store.delete_day(day, next_day, last)
+                    archived += rows
+                    logging.info(f"Archived {rows} interactions for {day}")
+            finally:
+                os.remove(self.lock_path)
+        return archived
+
+    # Partition days on disk within [start_day, end_day]
+    def days(self, start_day=None, end_day=None):
+        days = []
+        for name in os.listdir(self.root):
+            if not name.startswith('date='):
+                continue
+            day = name[len('date='):]
+            if (start_day is None or day >= start_day) and (end_day is None or day <= end_day):
+                days.append(day)
+        return sorted(days)
+
+    # Interactions from start_date through end_date (inclusive; dates or 'YYYY-MM-DD'),
+    # restricted to columns when given. Vote columns include the feedback log.
+    def load_data(self, start_date=None, end_date=None, columns=None):
+        start_day = _day(start_date) if start_date else None
+        end_day = _day(end_date) if end_date else None
+        selected = [column for column in (columns or interaction_store.COLUMNS) if column in interaction_store.COLUMNS]
+        votes = any(column in interaction_store.FEEDBACK_TYPES for column in selected)
+        read_columns = selected + ['interaction_id'] if votes and 'interaction_id' not in selected else selected
+        frames = []
+        try:
+            for day in self.days(start_day, end_day):
+                partition = self._partition(day)
+                for name in sorted(os.listdir(partition)):
+                    if name.endswith('.parquet'):
+                        frames.append(pd.read_parquet(os.path.join(partition, name), columns=read_columns))
+            if frames and votes:
+                frames = [interaction_store.add_feedback_counts(pd.concat(frames, ignore_index=True))[selected]]
+            else:
+                frames = [frame[selected] for frame in frames]
+        except Exception as e:
+            logging.error(f"Error reading interaction archive: {str(e)}")
+            frames = []
+        # The hot tail; rows not yet rolled over can belong to any day
+        tail = interaction_store.load_data(start_day, _next_day(end_day) if end_day else None, selected)
+        if 'timestamp' in tail.columns:
+            tail['timestamp'] = pd.to_datetime(tail['timestamp'], errors='coerce')
+        frames.append(tail)
+        data = pd.concat(frames, ignore_index=True)
+        if 'timestamp' in data.columns:
+            data = data.sort_values('timestamp', kind='stable', ignore_index=True)
+        return data
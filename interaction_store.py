@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+import pandas as pd
+from feedback_log import FeedbackLog
+
+DB_FILE = 'user_interactions.db'
+# Imported once into an empty database
+LEGACY_CSV_FILE = 'user_interactions.csv'
+# Key in the meta table recording that the legacy CSV was dealt with; rolling over
+# empties the interactions table daily, so an empty table says nothing about it
+LEGACY_IMPORT_KEY = 'legacy_csv_imported'
+MAX_RETRIES = 3
+
+# Columns the frontends write; the result column is 'sql_query' in some and 'result' in others
+COLUMNS = ['interaction_id', 'timestamp', 'question', 'sql_query', 'result', 'upvote', 'downvote', 'session_id']
+FEEDBACK_TYPES = ('upvote', 'downvote')
+
+_conn = None
+_lock = threading.Lock()
+_feedback = None
+
+# id is AUTOINCREMENT so rowids are never handed out again after rolling over empties
+# the table; archive part files are named by the rowids they hold
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS interactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        interaction_id TEXT NOT NULL,
+        timestamp TEXT,
+        question TEXT,
+        sql_query TEXT,
+        result TEXT,
+        upvote INTEGER DEFAULT 0,
+        downvote INTEGER DEFAULT 0,
+        session_id TEXT
+    )
+"""
+
+# Interaction log in SQLite (WAL mode), a drop-in for the user_interactions.csv helpers.
+# WAL lets every Streamlit process append while others read; votes go to the
+# append-only feedback log (see feedback_log.py) instead of rewriting rows.
+def _connection():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(CREATE_TABLE)
+        _add_autoincrement_id(_conn)
+        _conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_interactions_id ON interactions (interaction_id)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_interactions_session ON interactions (session_id)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_interactions_timestamp ON interactions (timestamp)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_interactions_question ON interactions (question)")
+        _conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        _conn.commit()
+    return _conn
+
+# Rebuild a table created without the AUTOINCREMENT id, keeping each row's rowid
+def _add_autoincrement_id(conn):
+    if 'id' in [row[1] for row in conn.execute("PRAGMA table_info(interactions)")]:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if 'id' not in [row[1] for row in conn.execute("PRAGMA table_info(interactions)")]:
+            conn.execute("ALTER TABLE interactions RENAME TO interactions_old")
+            conn.execute(CREATE_TABLE)
+            conn.execute(f"INSERT INTO interactions (id, {', '.join(COLUMNS)}) "
+                         f"SELECT rowid, {', '.join(COLUMNS)} FROM interactions_old")
+            conn.execute("DROP TABLE interactions_old")
+            logging.info("Added an AUTOINCREMENT id to the interactions table")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# Votes are appended to the feedback event log rather than updating interaction rows
+def _feedback_log():
+    global _feedback
+    with _lock:
+        if _feedback is None:
+            _feedback = FeedbackLog().start()
+    return _feedback
+
+def new_interaction_id():
+    return uuid.uuid4().hex
+
+# Rows as tuples in COLUMNS order; rows without an interaction_id get a new one
+def _rows(records):
+    rows = []
+    for record in records:
+        record = dict(record)
+        if not record.get('interaction_id'):
+            record['interaction_id'] = new_interaction_id()
+        if record.get('timestamp') is not None:
+            record['timestamp'] = str(record['timestamp'])
+        rows.append(tuple(record.get(column, 0 if column in FEEDBACK_TYPES else None) for column in COLUMNS))
+    return rows
+
+def _insert(rows):
+    placeholders = ", ".join("?" for _ in COLUMNS)
+    with _lock:
+        conn = _connection()
+        conn.executemany(f"INSERT OR IGNORE INTO interactions ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows)
+        conn.commit()
+
+def _legacy_imported(conn):
+    return conn.execute("SELECT 1 FROM meta WHERE key = ?", (LEGACY_IMPORT_KEY,)).fetchone() is not None
+
+# Create the database; an existing user_interactions.csv is imported the first time.
+# The import and its meta marker are written in one transaction, so it happens once
+# however many processes start together and however often the table is emptied.
+def init_csv():
+    with _lock:
+        if _legacy_imported(_connection()):
+            return
+    rows = []
+    if os.path.exists(LEGACY_CSV_FILE):
+        try:
+            rows = _rows(pd.read_csv(LEGACY_CSV_FILE).to_dict('records'))
+        except pd.errors.EmptyDataError:
+            pass
+        except Exception as e:
+            logging.error(f"Error importing {LEGACY_CSV_FILE}: {str(e)}")
+            return  # Try again on the next run
+    placeholders = ", ".join("?" for _ in COLUMNS)
+    with _lock:
+        conn = _connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if _legacy_imported(conn):
+                conn.rollback()
+                return
+            # A database written before the marker existed already holds its import
+            if rows and conn.execute("SELECT COUNT(*) FROM interactions").fetchone()[0] == 0:
+                conn.executemany(f"INSERT OR IGNORE INTO interactions ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows)
+                logging.info(f"Imported {len(rows)} interactions from {LEGACY_CSV_FILE}")
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (LEGACY_IMPORT_KEY, str(time.time())))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error importing {LEGACY_CSV_FILE}: {str(e)}")
+
+# Add the votes in the feedback log to the upvote and downvote columns
+def add_feedback_counts(data):
+    if not any(feedback_type in data.columns for feedback_type in FEEDBACK_TYPES):
+        return data
+    counts = _feedback_log().counts()
+    for feedback_type in FEEDBACK_TYPES:
+        if feedback_type in data.columns:
+            data[feedback_type] += data['interaction_id'].map(
+                lambda interaction_id: counts.get(interaction_id, {}).get(feedback_type, 0))
+    return data
+
+# Load interactions with timestamps in [start, end) ('YYYY-MM-DD' strings), optionally
+# only some columns. Older days are rolled into the Parquet archive, so this only holds
+# the recent tail; interaction_archive.load_data reads across both.
+def load_data(start=None, end=None, columns=None):
+    selected = [column for column in (columns or COLUMNS) if column in COLUMNS]
+    query_columns = selected if 'interaction_id' in selected else selected + ['interaction_id']
+    conditions, params = [], []
+    if start:
+        conditions.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        conditions.append("timestamp < ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    for _ in range(MAX_RETRIES):
+        try:
+            with _lock:
+                data = pd.read_sql_query(f"SELECT {', '.join(query_columns)} FROM interactions {where} ORDER BY timestamp",
+                                         _connection(), params=params)
+            return add_feedback_counts(data)[selected]
+        except Exception as e:
+            logging.error(f"Error loading interactions: {str(e)}")
+    return pd.DataFrame()  # Return empty DataFrame if all retries fail
+
+# Days ('YYYY-MM-DD') before day that still have rows in the database
+def days_before(day):
+    with _lock:
+        rows = _connection().execute(
+            "SELECT DISTINCT substr(timestamp, 1, 10) FROM interactions WHERE timestamp < ? ORDER BY 1", (day,)).fetchall()
+    return [row[0] for row in rows if row[0]]
+
+# All rows of one day plus the rowid range they span, for archiving
+def load_day(day, next_day):
+    with _lock:
+        conn = _connection()
+        first, last = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM interactions WHERE timestamp >= ? AND timestamp < ?",
+                                   (day, next_day)).fetchone()
+        data = pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM interactions WHERE timestamp >= ? AND timestamp < ? "
+                                 f"AND rowid <= ? ORDER BY rowid", conn, params=[day, next_day, last])
+    return data, first, last
+
+# Remove a day's rows once they are archived; rows added since load_day are kept
+def delete_day(day, next_day, last_rowid):
+    with _lock:
+        conn = _connection()
+        conn.execute("DELETE FROM interactions WHERE timestamp >= ? AND timestamp < ? AND rowid <= ?",
+                     (day, next_day, last_rowid))
+        conn.commit()
+
+# Append a DataFrame of interactions
+def append_to_csv(new_data):
+    unknown = [column for column in new_data.columns if column not in COLUMNS]
+    if unknown:
+        logging.warning(f"Ignoring columns not in the interaction store: {unknown}")
+    return append_records(new_data.to_dict('records'))
+
+# Append interaction records (dicts keyed by column) in one transaction; the
+# InteractionWriter batches into this
+def append_records(records):
+    rows = _rows(records)
+    for attempt in range(MAX_RETRIES):
+        try:
+            _insert(rows)
+            return True
+        except Exception as e:
+            logging.error(f"Error appending interactions: {str(e)}")
+            time.sleep(0.05 * (attempt + 1))
+    return False
+
+# Record an up- or downvote for an interaction. Votes are keyed by the id
+# handle_interaction returned, so they need no lookup by question and reach the right
+# row even while it is still queued in the InteractionWriter.
+def update_feedback(feedback_type, interaction_id):
+    if feedback_type not in FEEDBACK_TYPES:
+        raise ValueError(f"Unknown feedback type: {feedback_type}")
+    if not interaction_id:
+        logging.warning(f"No interaction to record {feedback_type} for")
+        return False
+    for _ in range(MAX_RETRIES):
+        try:
+            _feedback_log().record(interaction_id, feedback_type)
+            logging.info(f"Recorded {feedback_type} for interaction: {interaction_id}")
+            return True
+        except Exception as e:
+            logging.error(f"Error updating feedback: {str(e)}")
+    return False
@@ -0,0 +1,124 @@
+import atexit
+import queue
+import threading
+import time
+import logging
+
+FLUSH_MS = 200
+FLUSH_RECORDS = 50
+MAX_QUEUE = 1000
+# How long a request waits for room in a full queue before its record is dropped
+PUT_TIMEOUT_MS = 50
+
+_STOP = object()
+
+# Writes interaction records off the request path. submit() puts a dict on a bounded
+# queue; a background thread collects records until flush_records are pending or
+# flush_ms have passed since the first one and hands them to write_batch in one call.
+# When the queue is full submit() waits up to put_timeout_ms and then drops the record,
+# counting it, so a slow disk slows the log rather than the app. Pending records are
+# flushed by close(), which also runs at exit.
+class InteractionWriter:
+    def __init__(self, write_batch, flush_ms=FLUSH_MS, flush_records=FLUSH_RECORDS, max_queue=MAX_QUEUE,
+                 put_timeout_ms=PUT_TIMEOUT_MS):
+        self.write_batch = write_batch
+        self.flush_ms = flush_ms
+        self.flush_records = flush_records
+        self.put_timeout_ms = put_timeout_ms
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.flushes = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="interaction-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Queue a record; returns False if it was dropped
+    def submit(self, record):
+        if self._closed:
+            raise RuntimeError("Interaction writer is closed")
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.blocked += 1
+            try:
+                self._queue.put(record, timeout=self.put_timeout_ms / 1000)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                logging.warning(f"Interaction queue full; dropped record for question: {record.get('question')}")
+                return False
+        with self._lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            ok = self.write_batch(batch)
+        except Exception as e:
+            logging.error(f"Error writing interactions: {str(e)}")
+            ok = False
+        with self._lock:
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            if ok is False:
+                self.failed += len(batch)
+            else:
+                self.written += len(batch)
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_ms / 1000
+            stop = False
+            while len(batch) < self.flush_records:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            if stop:
+                return
+
+    # Write everything still queued and stop the thread
+    def close(self, timeout=10):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        logging.info(f"Interaction writer closed: {self.metrics()}")
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "written": self.written,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "blocked": self.blocked,
+                "flushes": self.flushes,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+            }
@@ -0,0 +1,96 @@
+import threading
+import uuid
+import logging
+from contextlib import contextmanager
+
+# Raised at a checkpoint once a newer request from the same session has superseded this one
+class JobCancelled(Exception):
+    pass
+
+# One question's work: SQL decode followed by the warehouse query.
+# cancel_event is handed to generate_sql_stream; cancel hooks (such as aborting the
+# running warehouse query) run when the job is cancelled.
+class Job:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.job_id = uuid.uuid4().hex
+        self.cancel_event = threading.Event()
+        self._cancel_hooks = []
+        self._lock = threading.Lock()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} was superseded")
+
+    # Register a hook to run on cancel; runs at once if the job is already cancelled
+    def on_cancel(self, hook):
+        with self._lock:
+            if not self.cancel_event.is_set():
+                self._cancel_hooks.append(hook)
+                return
+        hook()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancel_event.is_set():
+                return
+            self.cancel_event.set()
+            hooks, self._cancel_hooks = self._cancel_hooks, []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                logging.error(f"Error cancelling job {self.job_id}: {str(e)}")
+        logging.info(f"Cancelled job {self.job_id} for session {self.session_id}")
+
+# The current job of every Streamlit session. Starting a job cancels the session's
+# previous one, so a rerun (a second click or an edited question) stops the stale
+# decode between tokens and cancels its warehouse query.
+class JobRegistry:
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.cancelled_count = 0
+
+    def start(self, session_id):
+        job = Job(session_id)
+        with self._lock:
+            previous = self._jobs.get(session_id)
+            self._jobs[session_id] = job
+            if previous is not None:
+                self.cancelled_count += 1
+        if previous is not None:
+            previous.cancel()
+        return job
+
+    # Run a block as the session's current job. The job is cancelled if the block exits
+    # early, e.g. when a Streamlit rerun interrupts it at its next st call.
+    @contextmanager
+    def run(self, session_id):
+        job = self.start(session_id)
+        try:
+            yield job
+        except BaseException:
+            job.cancel()
+            raise
+        finally:
+            self.finish(job)
+
+    # Forget a job once it completes, unless a newer one has already replaced it
+    def finish(self, job):
+        with self._lock:
+            if self._jobs.get(job.session_id) is job:
+                del self._jobs[job.session_id]
+
+    def cancel(self, session_id):
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+        if job is not None:
+            job.cancel()
+
+    def active_count(self):
+        with self._lock:
+            return len(self._jobs)
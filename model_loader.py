@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+# Canned questions decoded once after loading to fault in the weight pages and
+# initialize the kernels before the first real user arrives
+WARMUP_QUESTIONS = [
+    "How many stadiums are there",
+    "What is the average capacity of stadiums in each location",
+]
+
+# One loaded generator and the requests currently using it
+class Deployment:
+    def __init__(self, version, generator, load_seconds, warmup_seconds):
+        self.version = version
+        self.generator = generator
+        self.load_seconds = load_seconds
+        self.warmup_seconds = warmup_seconds
+        self.loaded_at = time.time()
+        self.leases = 0
+        self.retired = False
+
+# Builds the generator in a background thread so the UI can render while the
+# weights load, and exposes whether it is ready yet.
+# factory(version) builds a generator, e.g. SQLGenerator with a model directory.
+# swap(version) loads another version in the background and switches new requests
+# to it once warmed up; requests holding a lease from acquire() finish on the old
+# generator, which is closed when the last of them returns.
+class ModelLoader:
+    def __init__(self, factory, version="./llama3_8b_ct2", warmup_questions=WARMUP_QUESTIONS):
+        self.factory = factory
+        self.warmup_questions = warmup_questions
+        self.error = None
+        self.swap_error = None
+        self.swapping_to = None
+        self.failed_version = None
+        self._active = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._initial_load, args=(version,), name="sql-model-loader", daemon=True)
+        self._thread.start()
+
+    def _load(self, version):
+        start = time.perf_counter()
+        generator = self.factory(version)
+        load_seconds = time.perf_counter() - start
+        if self.warmup_questions:
+            generator.generate_sql_batch(self.warmup_questions)
+        warmup_seconds = time.perf_counter() - start - load_seconds
+        logging.info(f"SQL generator {version} loaded in {load_seconds:.1f}s and warmed up in {warmup_seconds:.1f}s")
+        return Deployment(version, generator, load_seconds, warmup_seconds)
+
+    def _initial_load(self, version):
+        try:
+            self._active = self._load(version)
+        except Exception as e:
+            self.error = e
+            logging.error(f"Error loading SQL generator: {str(e)}")
+        finally:
+            self._done.set()
+
+    @property
+    def generator(self):
+        return self._active.generator if self._active else None
+
+    @property
+    def version(self):
+        return self._active.version if self._active else None
+
+    @property
+    def load_seconds(self):
+        return self._active.load_seconds if self._active else None
+
+    def is_ready(self):
+        return self._done.is_set() and self._active is not None
+
+    def status(self):
+        if not self._done.is_set():
+            return "loading"
+        return "failed" if self._active is None else "ready"
+
+    # Status, active version, load timings and any swap in progress, for health checks
+    def info(self):
+        active = self._active
+        return {
+            "status": self.status(),
+            "version": active.version if active else None,
+            "load_seconds": round(active.load_seconds, 1) if active else None,
+            "warmup_seconds": round(active.warmup_seconds, 1) if active else None,
+            "loaded_at": active.loaded_at if active else None,
+            "swapping_to": self.swapping_to,
+            "swap_error": str(self.swap_error) if self.swap_error else None,
+        }
+
+    def _wait(self, timeout):
+        if not self._done.wait(timeout):
+            raise TimeoutError("SQL generator is still loading")
+        if self._active is None:
+            raise RuntimeError(f"SQL generator failed to load: {str(self.error)}")
+
+    # Wait for the generator; raises if loading failed or timeout runs out first.
+    # Callers that run a request on it should use acquire() so a swap cannot close it mid-request.
+    def get(self, timeout=None):
+        self._wait(timeout)
+        return self._active.generator
+
+    # Lease the active generator for the duration of a request
+    @contextmanager
+    def acquire(self, timeout=None):
+        self._wait(timeout)
+        with self._lock:
+            deployment = self._active
+            deployment.leases += 1
+        try:
+            yield deployment.generator
+        finally:
+            with self._lock:
+                deployment.leases -= 1
+                retire = deployment is not self._active and deployment.leases == 0 and not deployment.retired
+                if retire:
+                    deployment.retired = True
+            if retire:
+                self._retire(deployment)
+
+    # Load version in the background and switch new requests to it once it is warm.
+    # The current generator keeps serving until then; a failed load leaves it in place.
+    def swap(self, version):
+        self._wait(None)
+        with self._lock:
+            if self.swapping_to is not None:
+                raise RuntimeError(f"Already swapping to {self.swapping_to}")
+            self.swapping_to = version
+        threading.Thread(target=self._swap, args=(version,), name="sql-model-swap", daemon=True).start()
+
+    def _swap(self, version):
+        try:
+            deployment = self._load(version)
+        except Exception as e:
+            self.swap_error = e
+            self.failed_version = version
+            logging.error(f"Error loading SQL generator {version}, keeping {self.version}: {str(e)}")
+            with self._lock:
+                self.swapping_to = None
+            return
+        with self._lock:
+            previous, self._active = self._active, deployment
+            self.swapping_to = None
+            self.swap_error = None
+            retire = previous.leases == 0 and not previous.retired
+            if retire:
+                previous.retired = True
+            else:
+                logging.info(f"Draining {previous.leases} requests on {previous.version}")
+        logging.info(f"Switched SQL generator from {previous.version} to {version}")
+        if retire:
+            self._retire(previous)
+
+    # Closing joins the generator's scheduler and executor and unloads the model, which
+    # can take a while; do it on its own thread rather than the request thread that let go
+    # of the last lease
+    def _retire(self, deployment):
+        threading.Thread(target=self._release, args=(deployment,), name="sql-model-retire", daemon=True).start()
+
+    def _release(self, deployment):
+        try:
+            close = getattr(deployment.generator, "close", None)
+            if close is not None:
+                close()
+            deployment.generator = None
+            logging.info(f"Released SQL generator {deployment.version}")
+        except Exception as e:
+            logging.error(f"Error releasing SQL generator {deployment.version}: {str(e)}")
+
+    # Swap whenever the file at path names a different version (for example a new model
+    # directory written there by a deploy script). A version that failed to load is not retried.
+    def watch(self, path, interval_seconds=30):
+        def poll():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    if not self.is_ready() or not os.path.exists(path):
+                        continue
+                    with open(path) as f:
+                        version = f.read().strip()
+                    if version and version not in (self.version, self.swapping_to, self.failed_version):
+                        self.swap(version)
+                except Exception as e:
+                    logging.error(f"Error checking model pointer {path}: {str(e)}")
+        threading.Thread(target=poll, name="sql-model-watch", daemon=True).start()
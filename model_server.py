@@ -0,0 +1,130 @@
+import argparse
+import json
+import logging
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sql_generator import SQLGenerator
+from model_loader import ModelLoader
+from batch_scheduler import INTERACTIVE, BACKGROUND
+from conversation import ConversationContext
+
+# Set up logging
+logging.basicConfig(filename='model_server.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MODEL_WAIT_SECONDS = 600
+
+# Serves one SQLGenerator to any number of frontend processes.
+# Every request runs on its own thread and lands in the generator's shared batch scheduler.
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    # 503 until the model has loaded and warmed up, so rollouts can gate on it.
+    # /metrics reports the scheduler's queue depth per priority class.
+    def do_GET(self):
+        loader = self.server.loader
+        if self.path == "/health":
+            if not loader.is_ready():
+                self._send_json(503, loader.info())
+                return
+            generator = loader.get()
+            self._send_json(200, dict(loader.info(),
+                                      schema_version=generator.schema_version,
+                                      prompt_fingerprint=generator.prompt_fingerprint))
+        elif self.path == "/metrics":
+            if not loader.is_ready():
+                self._send_json(503, {"status": loader.status()})
+                return
+            scheduler = loader.get().scheduler
+            self._send_json(200, scheduler.metrics() if scheduler else {})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    # POST /swap {"model_dir": ...} loads another model in the background and switches to it
+    # once warm; requests already running finish on the old one
+    def do_POST(self):
+        try:
+            request = self._read_json()
+            if self.path == "/swap":
+                self.server.loader.swap(request["model_dir"])
+                self._send_json(202, self.server.loader.info())
+                return
+            with self.server.loader.acquire(MODEL_WAIT_SECONDS) as generator:
+                self._handle(generator, request)
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {"error": f"Bad request: {str(e)}"})
+        except Exception as e:
+            logging.error(f"Error serving {self.path}: {str(e)}")
+            self._send_json(500, {"error": str(e)})
+
+    # Every endpoint queues in the scheduler at the payload's priority; batches default to BACKGROUND
+    def _handle(self, generator, request):
+        priority = int(request.get("priority", BACKGROUND if self.path == "/generate_batch" else INTERACTIVE))
+        session_id = request.get("session_id")
+        history = request.get("history")
+        context = ConversationContext.from_turns(history) if history else None
+        if self.path == "/generate":
+            self._send_json(200, {"sql": generator.generate_sql(request["question"], priority, session_id, context)})
+        elif self.path == "/generate_batch":
+            self._send_json(200, {"sql": generator.generate_sql_bulk(request["questions"], priority, session_id)})
+        elif self.path == "/generate_first_valid":
+            self._send_json(200, {"sql": generator.generate_sql_first_valid(request["question"], request.get("k", 4), priority)})
+        elif self.path == "/generate_stream":
+            self._stream(generator, request["question"], priority, session_id, context)
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    # One JSON line per decoded token; the connection is closed when the query is complete.
+    # A client that disconnects makes the next write fail, which closes the stream and
+    # stops its decode.
+    def _stream(self, generator, question, priority=INTERACTIVE, session_id=None, context=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            with closing(generator.generate_sql_stream(question, priority=priority, session_id=session_id, context=context)) as partial_sql:
+                for sql in partial_sql:
+                    self.wfile.write(json.dumps({"sql": sql}).encode() + b"\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            logging.info(f"Client disconnected, stream cancelled for question: {question}")
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logging.error(f"Error streaming SQL: {str(e)}")
+            self.wfile.write(json.dumps({"error": str(e)}).encode() + b"\n")
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve SQLGenerator over localhost HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model-dir", default="./llama3_8b_ct2")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), ModelRequestHandler)
+    server.daemon_threads = True
+    server.loader = ModelLoader(SQLGenerator, args.model_dir)
+    logging.info(f"Model server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+from datetime import datetime
+import pandas as pd
+from batch_scheduler import BACKGROUND
+from sample_questions import all_sample_questions
+from sql_cache import normalize_question
+from sql_generator import SQLGenerator
+
+SAMPLE_STORE_DIR = 'sample_results'
+REFRESH_SECONDS = 6 * 3600
+# How often a refresher checks whether the prompt or model changed under it
+CHECK_SECONDS = 60
+# Result sets kept on disk; older ones are pruned after each refresh
+KEEP_RESULT_SETS = 2
+
+# Precomputed SQL and Parquet results for the sample questions.
+# Each refresh writes its Parquet files under a versioned key (prompt fingerprint,
+# refresh time and process) and then swaps index.json to point at it, so readers never
+# see a half-written set, even with several app processes refreshing the same store.
+class SampleStore:
+    def __init__(self, root=SAMPLE_STORE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self._index = None
+        self._index_mtime = None
+        self._frames = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _load_index(self):
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return None
+        if mtime != self._index_mtime:
+            with open(self.index_path) as f:
+                self._index = json.load(f)
+            self._index_mtime = mtime
+            self._frames = {}
+        return self._index
+
+    # Fingerprint and refresh time of the current result set, or None before the first refresh
+    def current(self):
+        with self._lock:
+            index = self._load_index()
+        return None if index is None else (index['prompt_fingerprint'], index['refreshed_at'])
+
+    def is_stale(self, prompt_fingerprint, max_age_seconds):
+        current = self.current()
+        return current is None or current[0] != prompt_fingerprint or time.time() - current[1] > max_age_seconds
+
+    # (sql, DataFrame) for a sample question, or None if it was not precomputed.
+    # The DataFrame is None when the question was stored without results.
+    def get(self, question, prompt_fingerprint=None):
+        try:
+            with self._lock:
+                index = self._load_index()
+                if index is None or (prompt_fingerprint and index['prompt_fingerprint'] != prompt_fingerprint):
+                    return None
+                entry = index['questions'].get(normalize_question(question))
+                if entry is None:
+                    return None
+                if entry['results'] is None:
+                    return entry['sql'], None
+                path = os.path.join(self.root, entry['results'])
+                if path not in self._frames:
+                    self._frames[path] = pd.read_parquet(path)
+                return entry['sql'], self._frames[path]
+        except Exception as e:
+            logging.error(f"Error reading precomputed sample: {str(e)}")
+            return None
+
+    # Write a new result set; frames holds a DataFrame, or None, per question
+    def write(self, prompt_fingerprint, questions, sqls, frames):
+        refreshed_at = time.time()
+        key = f"{prompt_fingerprint}-{datetime.fromtimestamp(refreshed_at).strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        os.makedirs(os.path.join(self.root, key), exist_ok=True)
+        entries = {}
+        for question, sql, frame in zip(questions, sqls, frames):
+            results = None
+            if frame is not None:
+                results = f"{key}/{hashlib.sha256(question.encode()).hexdigest()[:16]}.parquet"
+                frame.to_parquet(os.path.join(self.root, results), compression='zstd', index=False)
+            entries[normalize_question(question)] = {'question': question, 'sql': sql, 'results': results}
+
+        index = {'prompt_fingerprint': prompt_fingerprint, 'refreshed_at': refreshed_at, 'key': key, 'questions': entries}
+        tmp_path = f"{self.index_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+        self._prune()
+        logging.info(f"Stored {len(entries)} precomputed samples under {key}")
+        return key
+
+    def _prune(self):
+        keys = sorted((name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))),
+                      key=lambda name: os.path.getmtime(os.path.join(self.root, name)))
+        for key in keys[:-KEEP_RESULT_SETS]:
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+# SQL for every question as BACKGROUND requests, so they only fill capacity typed
+# questions leave free, whether the generator is in-process or behind the model server
+def generate_all(generator, questions):
+    return generator.generate_sql_bulk(questions, priority=BACKGROUND)
+
+# Generate, execute and store every sample question; execute(sql) returns a DataFrame
+def precompute(generator, execute, store, questions=None):
+    questions = questions or all_sample_questions()
+    start = time.perf_counter()
+    sqls = generate_all(generator, questions)
+    frames = []
+    for question, sql in zip(questions, sqls):
+        try:
+            frames.append(execute(sql) if execute else None)
+        except Exception as e:
+            logging.error(f"Error executing sample question '{question}': {str(e)}")
+            frames.append(None)
+    key = store.write(generator.prompt_fingerprint, questions, sqls, frames)
+    logging.info(f"Precomputed {len(questions)} sample questions in {time.perf_counter() - start:.1f}s")
+    return key
+
+# Keeps the store fresh from inside an app: refreshes once the generator is available
+# and then whenever the result set is older than interval_seconds or was built from a
+# different prompt, such as after a schema change or model swap. That is checked every
+# check_seconds. acquire_generator() is a context manager yielding the generator, such as
+# ModelLoader.acquire, held for the whole refresh so a swap cannot close it mid-refresh.
+class SampleRefresher:
+    def __init__(self, store, acquire_generator, execute, questions=None, interval_seconds=REFRESH_SECONDS,
+                 check_seconds=CHECK_SECONDS):
+        self.store = store
+        self.acquire_generator = acquire_generator
+        self.execute = execute
+        self.questions = questions
+        self.interval_seconds = interval_seconds
+        self.check_seconds = check_seconds
+        self._thread = threading.Thread(target=self._run, name="sample-refresher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                with self.acquire_generator() as generator:
+                    if self.store.is_stale(generator.prompt_fingerprint, self.interval_seconds):
+                        precompute(generator, self.execute, self.store, self.questions)
+            except Exception as e:
+                logging.error(f"Error refreshing precomputed samples: {str(e)}")
+            time.sleep(self.check_seconds)
+
+# Load an execute function given as module:function
+def load_function(spec):
+    module_name, function_name = spec.split(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute SQL and results for the sample questions")
+    parser.add_argument("--model-dir", default="./llama3_8b_ct2")
+    parser.add_argument("--store", default=SAMPLE_STORE_DIR)
+    parser.add_argument("--execute", help="module:function taking SQL and returning a DataFrame; SQL only when unset")
+    parser.add_argument("--every", type=float, help="keep running and refresh every this many hours")
+    args = parser.parse_args()
+
+    generator = SQLGenerator(model_id=args.model_dir, batching=False)
+    execute = load_function(args.execute) if args.execute else None
+    store = SampleStore(args.store)
+    while True:
+        precompute(generator, execute, store)
+        if not args.every:
+            break
+        time.sleep(args.every * 3600)
+
+if __name__ == "__main__":
+    main()
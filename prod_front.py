@@ -6,7 +6,20 @@ import os
 from datetime import datetime
 import hashlib
 import logging
+from contextlib import closing
 from sql_generator import SQLGenerator
+from sql_client import SQLGeneratorClient
+from model_loader import ModelLoader
+from sql_cache import SQLCache
+from sql_extract import is_complete_sql
+from semantic_cache import SemanticCache
+from job_registry import JobRegistry, JobCancelled
+from batch_scheduler import INTERACTIVE, SAMPLE
+from sample_questions import SAMPLE_QUESTIONS
+from precompute_samples import SampleStore, SampleRefresher
+from interaction_store import init_csv, append_records, update_feedback, new_interaction_id
+from interaction_writer import InteractionWriter
+from interaction_archive import InteractionArchive
 
 # Set up logging
 logging.basicConfig(filename='app.log', level=logging.INFO, 
@@ -16,46 +29,60 @@ logging.basicConfig(filename='app.log', level=logging.INFO,
 st.set_page_config(page_title="NeuroFlake", layout="wide", initial_sidebar_state="collapsed")
 
 # Constants
-CSV_FILE = 'user_interactions.csv'
-MAX_RETRIES = 3
+MODEL_WAIT_SECONDS = 600
 
-# Initialize SQL Generator
+# Shared model server (see model_server.py); the model is loaded in-process when unset
+SQL_SERVER_URL = os.environ.get('SQL_SERVER_URL')
+# Model directory to load; writing another directory to MODEL_POINTER_FILE swaps to it without a restart
+MODEL_DIR = os.environ.get('MODEL_DIR', './llama3_8b_ct2')
+MODEL_POINTER_FILE = os.environ.get('MODEL_POINTER_FILE')
+
+# Initialize SQL Generator; it loads and warms up in the background
+@st.cache_resource
+def get_model_loader():
+    if SQL_SERVER_URL:
+        return ModelLoader(SQLGeneratorClient, SQL_SERVER_URL, warmup_questions=[])
+    loader = ModelLoader(SQLGenerator, MODEL_DIR)
+    if MODEL_POINTER_FILE:
+        loader.watch(MODEL_POINTER_FILE)
+    return loader
+
+model_loader = get_model_loader()
+
+# Initialize the question -> SQL cache
+@st.cache_resource
+def get_sql_cache():
+    return SQLCache()
+
+sql_cache = get_sql_cache()
+
+# Initialize the paraphrase cache consulted after an exact-match miss
+@st.cache_resource
+def get_semantic_cache():
+    return SemanticCache()
+
+semantic_cache = get_semantic_cache()
+
+# Initialize the per-session job registry; a new request cancels the session's previous one
+@st.cache_resource
+def get_job_registry():
+    return JobRegistry()
+
+job_registry = get_job_registry()
+
+# Initialize the background writer for the interaction log
 @st.cache_resource
-def get_sql_generator():
-    return SQLGenerator()
-
-sql_generator = get_sql_generator()
-
-# Initialize CSV file
-def init_csv():
-    if not os.path.exists(CSV_FILE):
-        df = pd.DataFrame(columns=['timestamp', 'question', 'result', 'upvote', 'downvote', 'session_id'])
-        df.to_csv(CSV_FILE, index=False)
-
-# Load CSV file
-@st.cache_data
-def load_data():
-    for _ in range(MAX_RETRIES):
-        try:
-            data = pd.read_csv(CSV_FILE)
-            return data
-        except pd.errors.EmptyDataError:
-            logging.warning(f"CSV file {CSV_FILE} is empty. Initializing with header.")
-            init_csv()
-        except Exception as e:
-            logging.error(f"Error loading CSV: {str(e)}")
-    return pd.DataFrame()  # Return empty DataFrame if all retries fail
-
-# Append data to CSV
-def append_to_csv(new_data):
-    for _ in range(MAX_RETRIES):
-        try:
-            with open(CSV_FILE, 'a', newline='') as f:
-                new_data.to_csv(f, header=f.tell()==0, index=False)
-            return True
-        except Exception as e:
-            logging.error(f"Error appending to CSV: {str(e)}")
-    return False
+def get_interaction_writer():
+    return InteractionWriter(append_records)
+
+interaction_writer = get_interaction_writer()
+
+# Initialize the interaction archive; finished days roll from the database into Parquet
+@st.cache_resource
+def get_interaction_archive():
+    return InteractionArchive().start()
+
+interaction_archive = get_interaction_archive()
 
 # Generate a session ID
 def generate_session_id():
@@ -72,56 +99,89 @@ def init_app():
         }
     if 'session_id' not in st.session_state:
         st.session_state['session_id'] = generate_session_id()
-    if 'last_question' not in st.session_state:
-        st.session_state['last_question'] = None
+    if 'last_interaction_id' not in st.session_state:
+        st.session_state['last_interaction_id'] = None
 
-# Generate SQL
-def generate_sql(question):
+# Generate SQL, streaming the partial query into the placeholder as it is decoded.
+# Sample-question clicks pass priority=SAMPLE so they queue behind typed questions.
+# Returns the SQL and the prompt fingerprint to cache it under once it has run (see
+# cache_sql), or None for SQL that came from a cache.
+def generate_sql(question, placeholder, job, priority=INTERACTIVE):
     try:
-        return sql_generator.generate_sql(question)
+        if not model_loader.is_ready():
+            with st.spinner("Waiting for the model to finish warming up..."):
+                model_loader.get(MODEL_WAIT_SECONDS)
+        # The lease keeps a hot-swapped model alive until this request is done
+        with model_loader.acquire() as sql_generator:
+            cached_sql = sql_cache.get(sql_generator.prompt_fingerprint, question)
+            if cached_sql is None:
+                cached_sql = semantic_cache.get(sql_generator.prompt_fingerprint, question)
+            if cached_sql is not None:
+                placeholder.code(cached_sql, language="sql")
+                return cached_sql, None
+            sql_response = ""
+            # closing() aborts the decode if a rerun interrupts the loop; the job's cancel
+            # event stops it when a newer request from this session supersedes it
+            with closing(sql_generator.generate_sql_stream(question, job.cancel_event, priority, job.session_id)) as partial_sql:
+                for sql_response in partial_sql:
+                    placeholder.code(sql_response, language="sql")
+            job.raise_if_cancelled()
+            return sql_response, sql_generator.prompt_fingerprint
+    except JobCancelled:
+        raise
     except Exception as e:
         logging.error(f"Error generating SQL: {str(e)}")
         raise
 
-# Mock function for query execution (replace with actual implementation)
-def execute_query(sql):
+# Put generated SQL into both question caches once it has executed. SQL that failed
+# or was cut off at the token budget is not kept, so a repeat of the question
+# generates again instead of being served the broken query.
+def cache_sql(prompt_fingerprint, question, sql_response):
+    if prompt_fingerprint is None or not is_complete_sql(sql_response):
+        return
+    sql_cache.put(prompt_fingerprint, question, sql_response)
+    semantic_cache.put(prompt_fingerprint, question, sql_response)
+
+# Mock function for query execution (replace with actual implementation).
+# The real query should register job.on_cancel with a hook that aborts it.
+def execute_query(sql, job=None):
     return "Query executed successfully. 5 rows returned."
 
-# Handle user interaction
+# Precomputed SQL for the sample questions, refreshed in the background
+@st.cache_resource
+def get_sample_store():
+    store = SampleStore()
+    SampleRefresher(store, model_loader.acquire, None).start()
+    return store
+
+sample_store = get_sample_store()
+
+# Precomputed (sql, DataFrame) for a sample question, only if it was built with the
+# prompt and model serving now; None sends the question to live generation
+def get_precomputed_sample(question):
+    generator = model_loader.generator
+    if generator is None:
+        return None
+    try:
+        return sample_store.get(question, generator.prompt_fingerprint)
+    except Exception as e:
+        logging.error(f"Error checking precomputed sample: {str(e)}")
+        return None
+
+# Handle user interaction; returns the id feedback on it is recorded against
 def handle_interaction(question, result):
-    new_data = pd.DataFrame({
-        'timestamp': [datetime.now()],
-        'question': [question.strip().replace('\n', ' ')],
-        'result': [result.strip().replace('\n', ' ')],
-        'upvote': [0],
-        'downvote': [0],
-        'session_id': [st.session_state['session_id']]
+    interaction_id = new_interaction_id()
+    interaction_writer.submit({
+        'interaction_id': interaction_id,
+        'timestamp': datetime.now(),
+        'question': question.strip().replace('\n', ' '),
+        'result': result.strip().replace('\n', ' '),
+        'upvote': 0,
+        'downvote': 0,
+        'session_id': st.session_state['session_id']
     })
-    append_to_csv(new_data)
-    st.session_state['last_question'] = question.strip().replace('\n', ' ')
-
-# Update feedback
-def update_feedback(feedback_type, question):
-    for _ in range(MAX_RETRIES):
-        try:
-            data = pd.read_csv(CSV_FILE)
-            if not data.empty:
-                # Find the most recent row with the matching question
-                matching_rows = data[data['question'] == question]
-                if not matching_rows.empty:
-                    latest_index = matching_rows.index[-1]
-                    data.loc[latest_index, feedback_type] = 1
-                    data.to_csv(CSV_FILE, index=False)
-                    logging.info(f"Updated {feedback_type} for question: {question}")
-                    return True
-                else:
-                    logging.warning(f"No matching question found for feedback: {question}")
-            else:
-                logging.warning("CSV file is empty")
-            return False
-        except Exception as e:
-            logging.error(f"Error updating feedback: {str(e)}")
-    return False
+    st.session_state['last_interaction_id'] = interaction_id
+    return interaction_id
 
 # Main app
 def main():
@@ -137,6 +197,10 @@ def main():
     """
 
     st.markdown('## NeuroFlake: AI-Powered Data Insights for Snowflake')
+    if model_loader.status() == "loading":
+        st.info("NeuroFlake is warming up its model. You can type your question now; answers start as soon as it is ready.")
+    elif model_loader.status() == "failed":
+        st.error("NeuroFlake could not load its model. Please try again later.")
 
     left_column, right_column = st.columns(2, gap="large")
 
@@ -157,20 +221,23 @@ def main():
                 if user_input:
                     user_input_placeholder.markdown(user_input)
                     try:
-                        with st.spinner("Generating SQL..."):
-                            sql_response = generate_sql(user_input)
-                        bot_response_1_placeholder.code(sql_response, language="sql")
-                        result_response = execute_query(sql_response)
-                        bot_response_2_placeholder.success(result_response)
-                        handle_interaction(user_input, result_response)
+                        with job_registry.run(st.session_state['session_id']) as job:
+                            sql_response, prompt_fingerprint = generate_sql(user_input, bot_response_1_placeholder, job)
+                            result_response = execute_query(sql_response, job)
+                            cache_sql(prompt_fingerprint, user_input, sql_response)
+                            job.raise_if_cancelled()
+                            bot_response_2_placeholder.success(result_response)
+                            handle_interaction(user_input, result_response)
+                    except JobCancelled:
+                        logging.info(f"Dropped superseded request: {user_input}")
                     except Exception as e:
                         logging.error(f"Error processing query: {str(e)}")
                         st.error("An error occurred while processing your query. Please try again.")
 
         with button_column[1]:
             if st.button("👍 Upvote", key="upvote", use_container_width=True):
-                if st.session_state.get('last_question'):
-                    if update_feedback('upvote', st.session_state['last_question']):
+                if st.session_state.get('last_interaction_id'):
+                    if update_feedback('upvote', st.session_state['last_interaction_id']):
                         button_info.success("Thanks for your feedback! NeuroFlake Memory updated")
                     else:
                         button_info.error("Failed to update feedback. Please try again.")
@@ -179,8 +246,8 @@ def main():
 
         with button_column[0]:
             if st.button("👎 Downvote", key="downvote", use_container_width=True):
-                if st.session_state.get('last_question'):
-                    if update_feedback('downvote', st.session_state['last_question']):
+                if st.session_state.get('last_interaction_id'):
+                    if update_feedback('downvote', st.session_state['last_interaction_id']):
                         button_info.warning("We're sorry the result wasn't helpful. Your feedback will help us improve!")
                     else:
                         button_info.error("Failed to update feedback. Please try again.")
@@ -188,15 +255,8 @@ def main():
                     button_info.warning("No recent question to downvote.")
 
         st.markdown("##### Sample questions you can ask:")
-        sample_questions = [
-            "What is the total revenue for each product category?",
-            "Who are the top 5 customers by sales volume?",
-            "What's the average order value by month?",
-            "Which regions have seen the highest growth in the last quarter?",
-            "What's the distribution of customer segments across different product lines?"
-        ]
         
-        for i, question in enumerate(sample_questions):
+        for i, question in enumerate(SAMPLE_QUESTIONS):
             question_columns = st.columns([7,1])
             with question_columns[0]:
                 st.markdown(f"<div class='mytext'>{question}</div>", unsafe_allow_html=True)
@@ -204,12 +264,21 @@ def main():
                 if st.button(f"Ask", use_container_width=True, key=f'question{i}'):
                     user_input_placeholder.markdown(question)
                     try:
-                        with st.spinner("Generating SQL..."):
-                            sql_response = generate_sql(question)
-                        bot_response_1_placeholder.code(sql_response, language="sql")
-                        result_response = execute_query(sql_response)
-                        bot_response_2_placeholder.success(result_response)
-                        handle_interaction(question, result_response)
+                        with job_registry.run(st.session_state['session_id']) as job:
+                            # Served from the precomputed store when available
+                            sql_response, _ = get_precomputed_sample(question) or (None, None)
+                            prompt_fingerprint = None
+                            if sql_response is None:
+                                sql_response, prompt_fingerprint = generate_sql(question, bot_response_1_placeholder, job, SAMPLE)
+                            else:
+                                bot_response_1_placeholder.code(sql_response, language="sql")
+                            result_response = execute_query(sql_response, job)
+                            cache_sql(prompt_fingerprint, question, sql_response)
+                            job.raise_if_cancelled()
+                            bot_response_2_placeholder.success(result_response)
+                            handle_interaction(question, result_response)
+                    except JobCancelled:
+                        logging.info(f"Dropped superseded request: {question}")
                     except Exception as e:
                         logging.error(f"Error processing sample question: {str(e)}")
                         st.error("An error occurred while processing your query. Please try again.")
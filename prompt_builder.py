@@ -0,0 +1,168 @@
+import hashlib
+import string
+import logging
+from collections import OrderedDict
+
+PROMPT_FILE = 'Prompt.txt'
+
+# The one field filled per request; every other placeholder is static per schema version
+QUESTION_FIELD = "user_question"
+
+SYSTEM_MESSAGE = "You are SQL Expert. Given an input question and schema, answer with correct sql query"
+
+# The prompt generate_sql has always used, with the same placeholders as Prompt.txt.
+# It is wrapped in the tokenizer's chat template by default_template().
+DEFAULT_USER_PROMPT = """
+{table_metadata_string}
+
+-- Using valid {db_type}, answer the following questions for the tables provided above.
+
+-- {user_question} ? (Generate 1 Sql query. No explanation needed)
+
+answer:
+            """
+
+# Compiled prompts kept for distinct table selections
+MAX_COMPILED_PROMPTS = 256
+
+# Render CREATE TABLE statements for the given tables, each preceded by its comment if any
+def render_ddl(table_schemas, table_comments=None):
+    table_comments = table_comments or {}
+    statements = []
+    for table, columns in table_schemas.items():
+        column_lines = ",\n".join(f"    {column} {column_type}" for column, column_type in columns.items())
+        comment = f"-- {table_comments[table]}\n" if table in table_comments else ""
+        statements.append(f"{comment}CREATE TABLE {table} (\n{column_lines}\n)")
+    return "\n\n".join(statements)
+
+# Short hash identifying the DDL a prompt was built from
+def schema_version(table_schemas, table_comments=None):
+    return hashlib.sha256(render_ddl(table_schemas, table_comments).encode()).hexdigest()[:12]
+
+# A prompt template parsed once into literal text and {placeholder} slots
+class PromptTemplate:
+    def __init__(self, text):
+        self.text = text
+        self.fingerprint = hashlib.sha256(text.encode()).hexdigest()[:12]
+        self.parts = []
+        for literal, field, _, _ in string.Formatter().parse(text):
+            if literal:
+                self.parts.append((literal, None))
+            if field is not None:
+                self.parts.append((None, field))
+
+    @classmethod
+    def from_file(cls, path=PROMPT_FILE):
+        with open(path) as f:
+            return cls(f.read())
+
+    # Text between the question slots with every static field filled in
+    def static_segments(self, fields):
+        segments = [""]
+        for literal, field in self.parts:
+            if field == QUESTION_FIELD:
+                segments.append("")
+            elif field is not None:
+                segments[-1] += fields[field]
+            else:
+                segments[-1] += literal
+        return segments
+
+# The original inline prompt wrapped in the tokenizer's chat template
+def default_template(tokenizer):
+    messages = [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": DEFAULT_USER_PROMPT},
+    ]
+    return PromptTemplate(tokenizer.apply_chat_template(
+        messages,
+        tokenize=False,
+        add_generation_prompt=True
+    ))
+
+# Prompt for one table selection with every static segment tokenized up front.
+# static_tokens (everything before the first question slot) is passed to ctranslate2
+# as the static prompt; per request only the question text goes through the tokenizer
+# and is spliced between the cached segments.
+class CompiledPrompt:
+    def __init__(self, tokenizer, segments, version, table_count):
+        self.tokenizer = tokenizer
+        self.version = version
+        self.table_count = table_count
+        # The template's own text starts with the BOS token if it has one
+        if tokenizer.bos_token and segments[0].startswith(tokenizer.bos_token):
+            segments = [segments[0][len(tokenizer.bos_token):]] + segments[1:]
+
+        # A non-newline character right before a question slot (a space or backtick)
+        # is tokenized with the question so the split falls on a pre-token boundary
+        self.leads = []
+        for i in range(len(segments) - 1):
+            lead = segments[i][-1:] if not segments[i].endswith("\n") else ""
+            segments[i] = segments[i][:len(segments[i]) - len(lead)]
+            self.leads.append(lead)
+
+        self.static_tokens = tokenizer.convert_ids_to_tokens(tokenizer.encode(segments[0]))
+        self.segment_tokens = [tokenizer.convert_ids_to_tokens(tokenizer.encode(segment, add_special_tokens=False))
+                               for segment in segments[1:]]
+        self.segment_token_count = sum(len(tokens) for tokens in self.segment_tokens)
+        logging.info(f"Compiled prompt for schema {version} ({len(self.static_tokens)} static tokens, "
+                     f"{len(self.leads)} question slots)")
+
+    # Tokens that follow the static prompt for a question. A follow-up question's
+    # ConversationContext supplies already tokenized earlier turns ahead of it in the
+    # first question slot only; later slots repeat just the question, so templates that
+    # restate the question do not prefill the history more than once.
+    def question_tokens(self, user_input, context=None):
+        by_lead = {}
+        tokens = []
+        for i, (lead, segment) in enumerate(zip(self.leads, self.segment_tokens)):
+            if i == 0 and context is not None and context.turns:
+                tokens += context.tokens(self.tokenizer, lead) + self.tokenizer.tokenize(" " + user_input) + segment
+                continue
+            if lead not in by_lead:
+                by_lead[lead] = self.tokenizer.tokenize(lead + user_input)
+            tokens += by_lead[lead] + segment
+        return tokens
+
+    # Length of one copy of the question inside question_tokens, less the context_length
+    # tokens of follow-up context in the first slot
+    def question_length(self, question_tokens, context_length=0):
+        return (len(question_tokens) - self.segment_token_count - context_length) // max(len(self.leads), 1)
+
+# Loads and parses a template once, caches the rendered DDL and instruction blocks per
+# schema version and compiles each table selection's prompt once
+class PromptBuilder:
+    def __init__(self, tokenizer, template, db_type="SQLite", instructions="", instruction_reflections=""):
+        self.tokenizer = tokenizer
+        self.template = template
+        self.terminators = [
+            tokenizer.eos_token_id,
+            tokenizer.convert_tokens_to_ids("<|eot_id|>")
+        ]
+        self.fields = {
+            "db_type": db_type,
+            "instructions": instructions,
+            "instruction_reflections": instruction_reflections,
+        }
+        self._compiled = OrderedDict()
+        logging.info(f"Prompt template {template.fingerprint} loaded with {len(template.parts)} parts")
+
+    # Compiled prompt for a table selection, kept in an LRU keyed by schema version
+    def compile(self, table_schemas, table_comments=None):
+        version = schema_version(table_schemas, table_comments)
+        prompt = self._compiled.get(version)
+        if prompt is not None:
+            self._compiled.move_to_end(version)
+            return prompt
+
+        fields = dict(self.fields, table_metadata_string=render_ddl(table_schemas, table_comments))
+        prompt = CompiledPrompt(self.tokenizer, self.template.static_segments(fields), version, len(table_schemas))
+        self._compiled[version] = prompt
+        if len(self._compiled) > MAX_COMPILED_PROMPTS:
+            self._compiled.popitem(last=False)
+        return prompt
+
+    # Full prompt text for a question, for checking the compiled path against
+    def render(self, table_schemas, user_input, table_comments=None):
+        fields = dict(self.fields, table_metadata_string=render_ddl(table_schemas, table_comments))
+        return user_input.join(self.template.static_segments(fields))
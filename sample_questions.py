@@ -0,0 +1,60 @@
+# Sample questions offered in the frontends
+SAMPLE_QUESTIONS = [
+    "What is the total revenue for each product category?",
+    "Who are the top 5 customers by sales volume?",
+    "What's the average order value by month?",
+    "Which regions have seen the highest growth in the last quarter?",
+    "What's the distribution of customer segments across different product lines?"
+]
+
+# Sample questions grouped by table (Corner2.py)
+SAMPLE_QUESTIONS_BY_TABLE = {
+    "CUSTOMERS": {
+        "Customer Demographics": [
+            "What is the distribution of customer segments?",
+            "How many customers do we have in each region?"
+        ],
+        "Customer Behavior": [
+            "Who are our most active customers?",
+            "What's the average customer lifetime value?"
+        ]
+    },
+    "ORDERS": {
+        "Order Analysis": [
+            "What is the average order value by month?",
+            "Which days of the week have the highest order volume?"
+        ],
+        "Order Trends": [
+            "What's the month-over-month order growth?",
+            "What's the distribution of order sizes?"
+        ]
+    },
+    "PRODUCTS": {
+        "Product Performance": [
+            "What are our top-selling products?",
+            "Which product categories have the highest profit margins?"
+        ],
+        "Product Analysis": [
+            "What's the price distribution across categories?",
+            "Which products are frequently bought together?"
+        ]
+    },
+    "SALES": {
+        "Sales Analysis": [
+            "What's our total revenue by product category?",
+            "Which regions have the highest sales growth?"
+        ],
+        "Sales Trends": [
+            "What's our year-over-year sales growth?",
+            "What's the seasonal pattern in our sales?"
+        ]
+    }
+}
+
+# Every sample question once, in display order
+def all_sample_questions():
+    questions = list(SAMPLE_QUESTIONS)
+    for groups in SAMPLE_QUESTIONS_BY_TABLE.values():
+        for group_questions in groups.values():
+            questions += [question for question in group_questions if question not in questions]
+    return questions
@@ -0,0 +1,57 @@
+import math
+import re
+import logging
+from collections import Counter
+
+# Lowercased word stems from free text or identifiers; snake_case and camelCase are split
+def index_terms(text):
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", text.lower().replace("_", " ")):
+        if len(word) > 3 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+# BM25 index over table names, column names and comments, used to put only the
+# tables relevant to a question into the prompt
+class SchemaIndex:
+    def __init__(self, table_schemas, table_comments=None, k1=1.2, b=0.75):
+        table_comments = table_comments or {}
+        self.k1 = k1
+        self.b = b
+        self.tables = list(table_schemas)
+        self.documents = []
+        for table, columns in table_schemas.items():
+            # The table name counts twice so a direct mention outranks a shared column name
+            text = " ".join([table, table, *columns, table_comments.get(table, "")])
+            self.documents.append(Counter(index_terms(text)))
+        self.lengths = [sum(document.values()) for document in self.documents]
+        self.average_length = sum(self.lengths) / max(len(self.lengths), 1)
+        document_frequency = Counter(term for document in self.documents for term in document)
+        self.idf = {
+            term: math.log(1 + (len(self.documents) - count + 0.5) / (count + 0.5))
+            for term, count in document_frequency.items()
+        }
+        logging.info(f"Schema index built over {len(self.tables)} tables and {len(self.idf)} terms")
+
+    def scores(self, question):
+        terms = [term for term in index_terms(question) if term in self.idf]
+        scores = []
+        for document, length in zip(self.documents, self.lengths):
+            score = 0.0
+            for term in terms:
+                frequency = document.get(term, 0)
+                if frequency:
+                    norm = self.k1 * (1 - self.b + self.b * length / self.average_length)
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            scores.append(score)
+        return scores
+
+    # Names of the k best matching tables, best first, in their catalog order on ties
+    def select(self, question, k):
+        scores = self.scores(question)
+        ranked = sorted(range(len(self.tables)), key=lambda i: -scores[i])
+        return [self.tables[i] for i in ranked[:k]]
@@ -0,0 +1,234 @@
+import atexit
+import difflib
+import os
+import re
+import threading
+import zlib
+import logging
+import numpy as np
+from schema_index import index_terms
+from sql_cache import normalize_question
+
+SEMANTIC_CACHE_FILE = 'semantic_cache.npz'
+# Bumped whenever question_features changes; saved indexes of another version are discarded
+FEATURE_VERSION = 3
+
+# Words that carry no meaning for matching questions to SQL. "total" is here because
+# "total revenue" and "revenue" per group are summed the same way.
+STOP_WORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "by", "per", "to", "and", "is", "are", "was", "were",
+    "what", "which", "who", "how", "do", "doe", "did", "we", "our", "me", "my", "you", "can", "show",
+    "list", "give", "tell", "find", "get", "each", "every", "all", "with", "from", "there", "that",
+    "this", "have", "has", "ha", "had", "been", "be", "will", "it", "total", "overall",
+}
+
+# Negations are always content words: "customers we do not have" is another question
+NEGATIONS = {"not", "no", "never", "without"}
+
+# Qualifiers that are the only words allowed to appear in one question and not the
+# other ("revenue by product category", "top 5 customers ranked by revenue"); any other
+# extra or missing content word makes the questions different
+FILLER_TERMS = {"product", "ranked", "placed", "performed"}
+
+# Phrases and words that ask for the same thing, mapped to one term
+SYNONYM_PHRASES = [
+    (re.compile(r"\b(?:how many|number of)\b", re.IGNORECASE), "count"),
+    (re.compile(r"\bcan['’]t\b", re.IGNORECASE), "can not"),
+    (re.compile(r"\bwon['’]t\b", re.IGNORECASE), "will not"),
+    (re.compile(r"n['’]t\b", re.IGNORECASE), " not"),
+]
+SYNONYMS = {
+    "mean": "average", "avg": "average",
+    "daily": "day", "weekly": "week", "monthly": "month", "yearly": "year", "annual": "year",
+    "highest": "max", "largest": "max", "biggest": "max", "maximum": "max",
+    "lowest": "min", "smallest": "min", "minimum": "min",
+}
+
+# Content words of a question: stems with synonyms merged and stop words removed
+def question_terms(question):
+    for pattern, replacement in SYNONYM_PHRASES:
+        question = pattern.sub(replacement, question)
+    words = (SYNONYMS.get(word, word) for word in index_terms(question))
+    return [word for word in words
+            if word in NEGATIONS or (word not in STOP_WORDS and (len(word) > 1 or word.isdigit()))]
+
+# Words within a small edit of each other ("ordered"/"order", typos) count as the same
+def _similar_terms(first, second):
+    return first == second or (min(len(first), len(second)) >= 5
+                               and difflib.SequenceMatcher(None, first, second).ratio() >= 0.8)
+
+# Content words either question has that the other lacks, other than FILLER_TERMS.
+# A word swapped for another ("revenue per region" vs "per category") counts twice, a
+# filter or negation only one side has ("in Europe", "not") once.
+def unmatched_terms(terms, other_terms):
+    missing = sum(term not in FILLER_TERMS and not any(_similar_terms(term, other) for other in other_terms)
+                  for term in terms)
+    extra = sum(other not in FILLER_TERMS and not any(_similar_terms(other, term) for term in terms)
+                for other in other_terms)
+    return missing + extra
+
+# Hashed TF features of a question: word stems and stem bigrams, plus character trigrams
+# of each stem at lower weight so small spelling and inflection differences still match
+def question_features(question, dimensions):
+    words = question_terms(question)
+    features = {}
+    def add(feature, weight):
+        index = zlib.crc32(feature.encode()) % dimensions
+        features[index] = features.get(index, 0.0) + weight
+    for word in words:
+        add("w:" + word, 1.0)
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            add("c:" + padded[i:i + 3], 0.25)
+    for first, second in zip(words, words[1:]):
+        add(f"b:{first} {second}", 0.5)
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for index, weight in features.items():
+        vector[index] = 1 + np.log(weight) if weight >= 1 else weight
+    return vector
+
+# Numbers in a question ("top 5", "2023") must match exactly for SQL to be reused
+def question_numbers(question):
+    return sorted(re.findall(r"\d+(?:\.\d+)?", question))
+
+# Paraphrase cache for generated SQL, consulted after an exact-match miss.
+# Questions are embedded as hashed n-gram TF-IDF vectors and compared by cosine
+# similarity against an in-memory numpy index; the closest stored question above
+# threshold has its SQL reused, provided it has the same numbers and at most
+# max_unmatched content words differ between the two questions (none by default: an
+# added filter or negation asks for different SQL). The defaults are tuned
+# on the labelled pairs in tests/test_semantic_cache.py: cosine alone cannot tell
+# "revenue by product category" (a paraphrase) from "revenue per region" (not one).
+# The index grows with every put and is saved to disk every save_every puts and at
+# exit. It holds entries for one prompt fingerprint and starts over when the prompt changes.
+class SemanticCache:
+    def __init__(self, path=SEMANTIC_CACHE_FILE, threshold=0.65, max_unmatched=0, dimensions=2048, max_entries=5000, save_every=20):
+        self.path = path
+        self.threshold = threshold
+        self.max_unmatched = max_unmatched
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.save_every = save_every
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._clear(None)
+        self._load()
+        atexit.register(self.save)
+
+    def _clear(self, prompt_fingerprint):
+        self.prompt_fingerprint = prompt_fingerprint
+        self.questions = []
+        self._terms = []
+        self.sqls = []
+        self._rows = {}
+        self._tf = np.zeros((64, self.dimensions), dtype=np.float32)
+        self._document_frequency = np.zeros(self.dimensions, dtype=np.float32)
+        self._weighted = None
+        self._unsaved = 0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            data = np.load(self.path)
+            if int(data["dimensions"]) != self.dimensions or int(data.get("feature_version", 1)) != FEATURE_VERSION:
+                logging.warning(f"Semantic cache {self.path} was built with other features; starting empty")
+                return
+            self._clear(str(data["prompt_fingerprint"]))
+            for question, sql, tf in zip(data["questions"].tolist(), data["sqls"].tolist(), data["tf"]):
+                self._append(question, sql, tf)
+            self._unsaved = 0
+            logging.info(f"Semantic cache loaded with {len(self.questions)} questions")
+        except Exception as e:
+            logging.error(f"Error loading semantic cache: {str(e)}")
+            self._clear(None)
+
+    def save(self):
+        with self._lock:
+            if not self._unsaved:
+                return
+            try:
+                count = len(self.questions)
+                # Per process and thread: every Streamlit process saves to the same path
+                tmp_path = f"{self.path}.{os.getpid()}-{threading.get_ident()}.tmp.npz"
+                np.savez(tmp_path, dimensions=self.dimensions, feature_version=FEATURE_VERSION, prompt_fingerprint=str(self.prompt_fingerprint),
+                         questions=np.array(self.questions, dtype=str), sqls=np.array(self.sqls, dtype=str),
+                         tf=self._tf[:count])
+                os.replace(tmp_path, self.path)
+                self._unsaved = 0
+            except Exception as e:
+                logging.error(f"Error saving semantic cache: {str(e)}")
+
+    def _append(self, question, sql, tf):
+        row = len(self.questions)
+        if row == len(self._tf):
+            self._tf = np.concatenate([self._tf, np.zeros_like(self._tf)])
+        self._tf[row] = tf
+        self._document_frequency += tf > 0
+        self.questions.append(question)
+        self._terms.append(question_terms(question))
+        self.sqls.append(sql)
+        self._rows[normalize_question(question)] = row
+        self._weighted = None
+
+    # Drop the oldest quarter of the entries once the index is full
+    def _evict(self):
+        keep = len(self.questions) - self.max_entries // 4
+        entries = list(zip(self.questions[-keep:], self.sqls[-keep:], self._tf[len(self.questions) - keep:len(self.questions)].copy()))
+        fingerprint = self.prompt_fingerprint
+        self._clear(fingerprint)
+        for question, sql, tf in entries:
+            self._append(question, sql, tf)
+        logging.info(f"Semantic cache evicted down to {keep} questions")
+
+    def _idf(self):
+        return np.log((1 + len(self.questions)) / (1 + self._document_frequency)) + 1
+
+    # TF-IDF rows normalized to unit length; rebuilt on the first lookup after the index grew
+    def _index(self):
+        if self._weighted is None:
+            weighted = self._tf[:len(self.questions)] * self._idf()
+            norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+            self._weighted = weighted / np.maximum(norms, 1e-9)
+        return self._weighted
+
+    def get(self, prompt_fingerprint, question):
+        with self._lock:
+            if prompt_fingerprint != self.prompt_fingerprint or not self.questions:
+                self.misses += 1
+                return None
+            query = question_features(question, self.dimensions) * self._idf()
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                self.misses += 1
+                return None
+            similarities = self._index() @ (query / norm)
+            numbers = question_numbers(question)
+            terms = question_terms(question)
+            for row in np.argsort(-similarities)[:5]:
+                if similarities[row] < self.threshold:
+                    break
+                if question_numbers(self.questions[row]) == numbers and unmatched_terms(terms, self._terms[row]) <= self.max_unmatched:
+                    self.hits += 1
+                    logging.info(f"Semantic cache hit ({similarities[row]:.2f}): '{question}' ~ '{self.questions[row]}'")
+                    return self.sqls[row]
+            self.misses += 1
+            return None
+
+    def put(self, prompt_fingerprint, question, sql):
+        with self._lock:
+            if prompt_fingerprint != self.prompt_fingerprint:
+                logging.info(f"Prompt fingerprint changed to {prompt_fingerprint}; semantic cache reset")
+                self._clear(prompt_fingerprint)
+            row = self._rows.get(normalize_question(question))
+            if row is not None:
+                self.sqls[row] = sql
+            else:
+                if len(self.questions) >= self.max_entries:
+                    self._evict()
+                self._append(question, sql, question_features(question, self.dimensions))
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+        if should_save:
+            self.save()
@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+import hashlib
+import time
+import re
+import logging
+from collections import OrderedDict
+
+CACHE_DB = 'sql_cache.db'
+
+# Lowercase, collapse whitespace and drop trailing punctuation so trivial variants share an entry
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?.!;")
+
+# Two-tier question -> SQL cache: an in-process LRU in front of a SQLite store.
+# Entries are keyed by the normalized question plus the prompt fingerprint, so a change
+# to the schema or prompt template never serves SQL generated for the old prompt.
+class SQLCache:
+    def __init__(self, db_path=CACHE_DB, max_memory_entries=1024, max_disk_entries=100000,
+                 ttl_seconds=7 * 24 * 3600, evict_every=100):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                key TEXT PRIMARY KEY,
+                question TEXT,
+                sql TEXT,
+                created_at REAL,
+                last_used REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sql_cache_last_used ON sql_cache (last_used)")
+        self._conn.commit()
+
+    def _key(self, prompt_fingerprint, question):
+        return hashlib.sha256(f"{prompt_fingerprint}\n{normalize_question(question)}".encode()).hexdigest()
+
+    def _log_counters(self, outcome, question):
+        logging.info(f"SQL cache {outcome} for question: {question} "
+                     f"(hits={self.hits}, disk_hits={self.disk_hits}, misses={self.misses})")
+
+    # Return the cached SQL for a question, or None
+    def get(self, prompt_fingerprint, question):
+        key = self._key(prompt_fingerprint, question)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self._log_counters("hit", question)
+                return entry[0]
+            self._memory.pop(key, None)
+
+            try:
+                row = self._conn.execute("SELECT sql, created_at FROM sql_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] < self.ttl_seconds:
+                    self._conn.execute("UPDATE sql_cache SET last_used = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._log_counters("hit", question)
+                    return row[0]
+            except sqlite3.Error as e:
+                logging.error(f"Error reading SQL cache: {str(e)}")
+
+            self.misses += 1
+            self._log_counters("miss", question)
+            return None
+
+    def put(self, prompt_fingerprint, question, sql):
+        key = self._key(prompt_fingerprint, question)
+        now = time.time()
+        with self._lock:
+            self._remember(key, sql, now)
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO sql_cache VALUES (?, ?, ?, ?, ?)",
+                                   (key, normalize_question(question), sql, now, now))
+                self._conn.commit()
+                self._puts += 1
+                if self._puts % self.evict_every == 0:
+                    self._evict_disk(now)
+            except sqlite3.Error as e:
+                logging.error(f"Error writing SQL cache: {str(e)}")
+
+    def _remember(self, key, sql, created_at):
+        self._memory[key] = (sql, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    # Drop expired rows, then the least recently used ones beyond max_disk_entries
+    def _evict_disk(self, now):
+        expired = self._conn.execute("DELETE FROM sql_cache WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        trimmed = self._conn.execute("""
+            DELETE FROM sql_cache WHERE key IN (
+                SELECT key FROM sql_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_disk_entries,)).rowcount
+        self._conn.commit()
+        logging.info(f"SQL cache eviction removed {expired} expired and {trimmed} least recently used entries")
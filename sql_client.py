@@ -0,0 +1,90 @@
+import json
+import time
+import logging
+import urllib.request
+from batch_scheduler import INTERACTIVE, BACKGROUND
+
+# Thin client for model_server.py with the same interface as SQLGenerator,
+# so frontends can share one model process instead of each loading the weights
+class SQLGeneratorClient:
+    def __init__(self, server_url, timeout=120, health_ttl_seconds=30):
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        self.health_ttl_seconds = health_ttl_seconds
+        self._health = None
+        self._health_checked_at = 0
+        logging.info(f"SQL Generator client using {self.server_url}")
+
+    def _post(self, path, payload):
+        request = urllib.request.Request(self.server_url + path, data=json.dumps(payload).encode(),
+                                         headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    # Server health, refreshed at most every health_ttl_seconds.
+    # Raises HTTPError (503) while the server is still loading its model.
+    def health(self):
+        if self._health is None or time.monotonic() - self._health_checked_at > self.health_ttl_seconds:
+            with urllib.request.urlopen(self.server_url + "/health", timeout=self.timeout) as response:
+                self._health = json.load(response)
+            self._health_checked_at = time.monotonic()
+        return self._health
+
+    @property
+    def schema_version(self):
+        return self.health()["schema_version"]
+
+    @property
+    def prompt_fingerprint(self):
+        return self.health()["prompt_fingerprint"]
+
+    # A follow-up's context travels as its (question, sql) turns; the server tokenizes them
+    def generate_sql(self, user_input, priority=INTERACTIVE, session_id=None, context=None):
+        try:
+            payload = {"question": user_input, "priority": priority, "session_id": session_id,
+                       "history": context.turns if context is not None else []}
+            with self._post("/generate", payload) as response:
+                return json.load(response)["sql"]
+        except Exception as e:
+            logging.error(f"Error generating SQL via model server: {str(e)}")
+            raise
+
+    # The server queues these at priority, so bulk jobs only use their class share of each batch
+    def generate_sql_bulk(self, user_inputs, priority=BACKGROUND, session_id=None):
+        try:
+            payload = {"questions": user_inputs, "priority": priority, "session_id": session_id}
+            with self._post("/generate_batch", payload) as response:
+                return json.load(response)["sql"]
+        except Exception as e:
+            logging.error(f"Error generating SQL via model server: {str(e)}")
+            raise
+
+    def generate_sql_first_valid(self, user_input, k=4, priority=INTERACTIVE):
+        try:
+            payload = {"question": user_input, "k": k, "priority": priority}
+            with self._post("/generate_first_valid", payload) as response:
+                return json.load(response)["sql"]
+        except Exception as e:
+            logging.error(f"Error generating SQL via model server: {str(e)}")
+            raise
+
+    # Closing the generator or setting cancel_event drops the connection,
+    # which makes the server abort the decode
+    def generate_sql_stream(self, user_input, cancel_event=None, priority=INTERACTIVE, session_id=None, context=None):
+        try:
+            payload = {"question": user_input, "priority": priority, "session_id": session_id,
+                       "history": context.turns if context is not None else []}
+            response = self._post("/generate_stream", payload)
+        except Exception as e:
+            logging.error(f"Error streaming SQL via model server: {str(e)}")
+            raise
+        try:
+            for line in response:
+                if cancel_event is not None and cancel_event.is_set():
+                    logging.info(f"SQL stream cancelled for input: {user_input}")
+                    break
+                message = json.loads(line)
+                if "error" in message:
+                    raise RuntimeError(f"Model server error: {message['error']}")
+                yield message["sql"]
+        finally:
+            response.close()
@@ -0,0 +1,60 @@
+import re
+
+# Where a statement starts when the model writes it without a fence: a statement keyword
+# at the start of the text, of a line, or after a colon ("Here's the query: SELECT ...")
+SQL_START = re.compile(r"(?:^|[:\n])\s*((?:SELECT|WITH|INSERT|UPDATE|DELETE)\b)", re.IGNORECASE)
+
+# Start and end of the SQL statement in generated text. A ``` fence that comes before
+# any SQL opens the block wherever it appears, so explanation before it ("Here is the
+# SQL query:") is skipped; a fence after SQL content closes it. The statement ends after
+# a ';' outside string literals or at a closing fence; quotes are only tracked once the
+# SQL has started, so apostrophes in explanation text do not count.
+# end is None while the statement is still incomplete. Text with neither a fence nor a
+# statement keyword is returned whole.
+def sql_span(text):
+    fence = text.find("```")
+    statement = SQL_START.search(text)
+    statement_start = statement.start(1) if statement else None
+    if fence != -1 and (statement_start is None or fence < statement_start):
+        newline = text.find("\n", fence)
+        if newline == -1:
+            return len(text), None
+        start = newline + 1
+    elif statement_start is not None:
+        start = statement_start
+    else:
+        return 0, None
+    quote = None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == ";":
+            return start, i + 1
+        elif text.startswith("```", i):
+            return start, i
+    return start, None
+
+# The SQL statement in generated text, without fences or surrounding explanation
+def extract_sql(text):
+    start, end = sql_span(text)
+    return text[start:end].strip()
+
+# Whether text holds a finished statement (ended by ';' or a closing fence) rather than
+# one cut off at the token budget
+def is_complete_sql(text):
+    return sql_span(text)[1] is not None
+
+# Follows decoded text token by token and reports when the SQL statement is complete,
+# so decoding can stop instead of running on into explanation text
+class SQLEndDetector:
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.text = ""
+
+    def feed(self, token):
+        self.text += self.tokenizer.convert_tokens_to_string([token])
+        return sql_span(self.text)[1] is not None
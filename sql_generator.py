@@ -2,71 +2,310 @@ import ctranslate2
 import transformers
 from huggingface_hub import snapshot_download
 import logging
+import hashlib
+import queue
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from batch_scheduler import BatchScheduler, INTERACTIVE, BACKGROUND
+from Sql_hallucination import validate_sql_for_schema
+from sql_extract import extract_sql, SQLEndDetector
+from schema_index import SchemaIndex
+from prompt_builder import PromptBuilder, PromptTemplate, default_template, schema_version
+from inference_profile import DEFAULT_PROFILE, load_profile, save_profile, tune_profile
 
 # Set up logging
 logging.basicConfig(filename='sql_generator.log', level=logging.INFO, 
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Decode budget: every question gets MIN_LENGTH tokens plus room that grows with
+# the question and schema size, capped at MAX_LENGTH
+MIN_LENGTH = 64
+MAX_LENGTH = 256
+
+# Schemas with more tables than this are indexed, and each prompt only gets the
+# TOP_K_TABLES tables most relevant to its question
+TOP_K_TABLES = 5
+
+# Candidate decodes sample from the CANDIDATE_TOPK most likely tokens; ctranslate2's
+# default of 1 is greedy, which would make every candidate the same
+CANDIDATE_TOPK = 40
+
+# Question decoded when benchmarking compute types and thread layouts
+TUNING_QUESTION = "What is the average capacity of stadiums in each location"
+
+# Tables given to the model, as {table: {column: type}}
+TABLE_SCHEMAS = {
+    "stadium": {
+        "stadium_id": "number",
+        "location": "text",
+        "name": "text",
+        "capacity": "number",
+        "highest": "number",
+        "lowest": "number",
+        "average": "number",
+    },
+    "singer_in_concert": {
+        "concert_id": "number",
+        "singer_id": "text",
+    },
+}
+
 class SQLGenerator:
-    def __init__(self):
+    # With tune=True the CPU profile is benchmarked on first start and saved next to the model
+    # prompt_template is a template file such as Prompt.txt; by default the original inline
+    # prompt is used. db_type and instructions fill the template's static placeholders.
+    # profile overrides the saved inference profile; model and tokenizer replace the ones
+    # loaded from model_id (the benchmark passes stubs here).
+    def __init__(self, model_id="./llama3_8b_ct2", table_schemas=TABLE_SCHEMAS, table_comments=None, top_k_tables=TOP_K_TABLES,
+                 prompt_template=None, db_type="SQLite", instructions="", instruction_reflections="",
+                 tune=True, profile=None, batching=True, max_batch_size=8, max_wait_ms=20, model=None, tokenizer=None):
         try:
-            model_id = "./llama3_8b_ct2"
             #model_path = snapshot_download(model_id)
-            self.model = ctranslate2.Generator(model_id)
-            self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_id)
+            self.model_id = model_id
+            self.tokenizer = tokenizer or transformers.AutoTokenizer.from_pretrained(model_id)
+            template = PromptTemplate.from_file(prompt_template) if prompt_template else default_template(self.tokenizer)
+            self.prompt_builder = PromptBuilder(self.tokenizer, template, db_type, instructions, instruction_reflections)
+            self.terminators = self.prompt_builder.terminators
+            self.top_k_tables = top_k_tables
+            self._prompt_lock = threading.Lock()
+            self.set_table_schemas(table_schemas, table_comments)
+            self.profile = profile or self._load_profile(model_id, tune, max_batch_size)
+            self.model = model or ctranslate2.Generator(model_id, device="cpu",
+                                                        compute_type=self.profile["compute_type"],
+                                                        inter_threads=self.profile["inter_threads"],
+                                                        intra_threads=self.profile["intra_threads"])
+            # Shared across sessions since the generator is an st.cache_resource singleton
+            self.scheduler = BatchScheduler(self.generate_sql_batch, max_batch_size, max_wait_ms) if batching else None
+            # Without the scheduler, generate_sql_async runs decodes here, one per inter thread
+            self._executor = None if batching else ThreadPoolExecutor(max_workers=self.profile["inter_threads"],
+                                                                      thread_name_prefix="sql-generate")
             logging.info("SQL Generator initialized successfully")
         except Exception as e:
             logging.error(f"Error initializing SQL Generator: {str(e)}")
             raise
 
-    def generate_sql(self, user_input):
+    def _load_profile(self, model_id, tune, batch_size):
+        profile = load_profile(model_id)
+        if profile is None and tune:
+            logging.info("No inference profile saved, tuning compute type and threads")
+            prompt = self._prompt_for(TUNING_QUESTION)
+            profile = tune_profile(model_id, prompt.static_tokens + prompt.question_tokens(TUNING_QUESTION),
+                                   self.terminators, batch_size)
+            save_profile(model_id, profile)
+        profile = profile or DEFAULT_PROFILE
+        logging.info(f"Using inference profile: {profile}")
+        return profile
+
+    # Switch to a new schema. Up to top_k_tables tables go into every prompt whole;
+    # larger schemas are indexed and each question gets only its most relevant tables.
+    def set_table_schemas(self, table_schemas, table_comments=None):
+        self.table_schemas = table_schemas
+        self.table_comments = table_comments or {}
+        self.schema_version = schema_version(table_schemas, self.table_comments)
+        self.schema_index = SchemaIndex(table_schemas, self.table_comments) if len(table_schemas) > self.top_k_tables else None
+        # The prompt for a question is fully determined by the template, its fields, the schema and table selection.
+        # The model is included so SQL cached for one model is not served after swapping to another.
+        builder = self.prompt_builder
+        self.prompt_fingerprint = hashlib.sha256(
+            f"{self.model_id}{builder.template.fingerprint}{sorted(builder.fields.items())}{self.schema_version}{self.top_k_tables}".encode()
+        ).hexdigest()[:12]
+        logging.info(f"Using schema version {self.schema_version} ({len(table_schemas)} tables)")
+
+    # Tables that go into the prompt for a question, in catalog order
+    def _tables_for(self, user_input):
+        if self.schema_index is None:
+            return self.table_schemas
+        selected = set(self.schema_index.select(user_input, self.top_k_tables))
+        return {table: columns for table, columns in self.table_schemas.items() if table in selected}
+
+    # Compiled prompt for a question; the builder compiles each table selection once.
+    # A follow-up's tables are picked using the earlier questions too.
+    def _prompt_for(self, user_input, context=None):
+        if context is not None and context.turns:
+            user_input = f"{context.retrieval_text()} {user_input}"
+        table_schemas = self._tables_for(user_input)
+        table_comments = {table: comment for table, comment in self.table_comments.items() if table in table_schemas}
+        with self._prompt_lock:
+            return self.prompt_builder.compile(table_schemas, table_comments)
+
+    # Decode budget for a question, see MIN_LENGTH; follow-up context does not count
+    def _max_length(self, prompt, question_tokens, context=None):
+        context_length = len(context.tokens(self.tokenizer, prompt.leads[0])) if context is not None and prompt.leads else 0
+        question_length = prompt.question_length(question_tokens, context_length)
+        return min(MAX_LENGTH, MIN_LENGTH + 2 * question_length + 4 * prompt.table_count)
+
+    # Greedy unless sample is set, as for generate_sql_candidates
+    def _decode_options(self, max_length, sample=False):
+        return dict(max_length=max_length, sampling_topk=CANDIDATE_TOPK if sample else 1, sampling_temperature=0.6,
+                    sampling_topp=0.9, end_token=self.terminators)
+
+    # Stop the scheduler and executor once queued requests are done and free the weights.
+    # Used when the model is swapped out; the generator cannot be used afterwards.
+    def close(self):
+        if self.scheduler is not None:
+            self.scheduler.close(wait=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.model.unload_model()
+        self.model = None
+        logging.info("SQL Generator closed")
+
+    # Decode several questions in one generate_batch call.
+    # on_tokens holds an optional per-question token callback (see BatchScheduler.submit)
+    # and contexts an optional ConversationContext per question for follow-ups. Earlier
+    # turns go into the per-question suffix after the shared static prompt: ctranslate2
+    # caches one static prompt state and cannot extend it per session.
+    # sample=True samples each sequence instead of decoding greedily.
+    def generate_sql_batch(self, user_inputs, on_tokens=None, contexts=None, sample=False):
         try:
-            prompt = f"""
-CREATE TABLE stadium (
-    stadium_id number,
-    location text,
-    name text,
-    capacity number,
-    highest number,
-    lowest number,
-    average number
-)
-
-CREATE TABLE singer_in_concert (
-    concert_id number,
-    singer_id text
-)
-
--- Using valid SQLite, answer the following questions for the tables provided above.
-
--- {user_input} ? (Generate 1 Sql query. No explanation needed)
-
-answer:
-            """
-
-            messages = [
-                {"role": "system", "content": "You are SQL Expert. Given an input question and schema, answer with correct sql query"},
-                {"role": "user", "content": prompt},
-            ]
-
-            input_ids = self.tokenizer.apply_chat_template(
-                messages, 
-                tokenize=False, 
-                add_generation_prompt=True
-            )
-
-            terminators = [
-                self.tokenizer.eos_token_id,
-                self.tokenizer.convert_tokens_to_ids("<|eot_id|>")
-            ]
-
-            input_tokens = self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(input_ids))
-
-            results = self.model.generate_batch([input_tokens], include_prompt_in_result=False, max_length=256, sampling_temperature=0.6, sampling_topp=0.9, end_token=terminators)
-            output = self.tokenizer.decode(results[0].sequences_ids[0])
-
-            logging.info(f"SQL generated for input: {user_input}")
-            return output.strip()
+            contexts = contexts or [None] * len(user_inputs)
+            prompts = [self._prompt_for(user_input, context) for user_input, context in zip(user_inputs, contexts)]
+            input_tokens = [prompt.question_tokens(user_input, context)
+                            for prompt, user_input, context in zip(prompts, user_inputs, contexts)]
+            max_length = max(self._max_length(prompt, tokens, context)
+                             for prompt, tokens, context in zip(prompts, input_tokens, contexts))
+
+            # ctranslate2 takes one static prompt per call. When the questions in the batch
+            # selected different tables, send each full prompt instead of splitting the batch.
+            static_prompt = prompts[0].static_tokens
+            if any(prompt is not prompts[0] for prompt in prompts):
+                static_prompt = None
+                input_tokens = [prompt.static_tokens + tokens for prompt, tokens in zip(prompts, input_tokens)]
+
+            # Returning True stops decoding for that batch index
+            detectors = [SQLEndDetector(self.tokenizer) for _ in user_inputs]
+            def callback(step_result):
+                on_token = on_tokens[step_result.batch_id] if on_tokens else None
+                cancelled = bool(on_token and on_token(step_result.token_id))
+                return detectors[step_result.batch_id].feed(step_result.token) or cancelled
+
+            results = self.model.generate_batch(input_tokens, static_prompt=static_prompt, include_prompt_in_result=False, callback=callback, max_batch_size=self.profile["max_batch_size"], **self._decode_options(max_length, sample))
+            outputs = [extract_sql(self.tokenizer.decode(result.sequences_ids[0], skip_special_tokens=True)) for result in results]
+
+            logging.info(f"SQL generated for {len(user_inputs)} inputs")
+            return outputs
         except Exception as e:
             logging.error(f"Error generating SQL: {str(e)}")
             raise
+
+    # priority and session_id place the request in the scheduler (see BatchScheduler);
+    # context makes it a follow-up to the session's earlier questions
+    def generate_sql(self, user_input, priority=INTERACTIVE, session_id=None, context=None):
+        if self.scheduler is None:
+            return self.generate_sql_batch([user_input], contexts=[context])[0]
+        output = self.scheduler.submit(user_input, priority=priority, session_id=session_id, context=context).result()
+        logging.info(f"SQL generated for input: {user_input}")
+        return output
+
+    # Awaitable generate_sql for asyncio services; any number of calls can be awaited at
+    # once without a thread each. Requests join the batching queue, or the generator's
+    # executor when batching is off. On timeout or cancellation a queued request is
+    # dropped and a running one stops decoding at its next token.
+    async def generate_sql_async(self, user_input, timeout=None, priority=INTERACTIVE, session_id=None, context=None):
+        cancelled = threading.Event()
+        def on_token(token_id):
+            return cancelled.is_set()
+
+        if self.scheduler is None:
+            future = self._executor.submit(lambda: self.generate_sql_batch([user_input], [on_token], [context])[0])
+        else:
+            future = self.scheduler.submit(user_input, on_token, priority, session_id, context)
+        try:
+            output = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            cancelled.set()
+            future.cancel()
+            logging.info(f"SQL generation {'timed out' if isinstance(e, asyncio.TimeoutError) else 'cancelled'} for input: {user_input}")
+            raise
+        logging.info(f"SQL generated for input: {user_input}")
+        return output
+
+    # SQL for several questions, queued at priority so bulk callers only get their class
+    # share of each batch instead of decoding alongside it; one batched decode without the scheduler
+    def generate_sql_bulk(self, user_inputs, priority=BACKGROUND, session_id=None):
+        if self.scheduler is None:
+            return self.generate_sql_batch(user_inputs)
+        futures = [self.scheduler.submit(user_input, priority=priority, session_id=session_id) for user_input in user_inputs]
+        return [future.result() for future in futures]
+
+    # Sample k candidate queries for one question. The question is replicated across the
+    # batch; the shared static prompt keeps the extra prefill small. With the scheduler the
+    # copies are queued at priority and batched with other sampled requests only.
+    def generate_sql_candidates(self, user_input, k=4, priority=INTERACTIVE):
+        if self.scheduler is None:
+            return self.generate_sql_batch([user_input] * k, sample=True)
+        futures = [self.scheduler.submit(user_input, priority=priority, sample=True) for _ in range(k)]
+        return [future.result() for future in futures]
+
+    # Check a query's tables and columns against the current schema
+    def validate_sql(self, sql):
+        return validate_sql_for_schema(sql, self.table_schemas)
+
+    # Decode k candidates at once and return the first that passes schema validation,
+    # falling back to the first candidate when none do
+    def generate_sql_first_valid(self, user_input, k=4, priority=INTERACTIVE):
+        candidates = self.generate_sql_candidates(user_input, k, priority)
+        for i, candidate in enumerate(candidates):
+            is_valid, invalid_columns = self.validate_sql(candidate)
+            if is_valid:
+                logging.info(f"Candidate {i + 1}/{k} passed schema validation for input: {user_input}")
+                return candidate
+            logging.info(f"Candidate {i + 1}/{k} has unknown tables or columns {invalid_columns}")
+        logging.warning(f"No valid candidate among {k} for input: {user_input}")
+        return candidates[0]
+
+    # Token ids for one question as they are decoded; stops once should_stop() is true
+    def _stream_token_ids(self, user_input, should_stop, priority=INTERACTIVE, session_id=None, context=None):
+        if self.scheduler is None:
+            prompt = self._prompt_for(user_input, context)
+            input_tokens = prompt.question_tokens(user_input, context)
+            step_results = self.model.generate_tokens(input_tokens, static_prompt=prompt.static_tokens, **self._decode_options(self._max_length(prompt, input_tokens, context)))
+            detector = SQLEndDetector(self.tokenizer)
+            try:
+                for step_result in step_results:
+                    yield step_result.token_id
+                    if detector.feed(step_result.token):
+                        break
+            finally:
+                # Closing the iterator is how ctranslate2 aborts the decode
+                step_results.close()
+            return
+
+        # Ride along in the shared batch; the step callback feeds this request's tokens back
+        token_ids = queue.Queue()
+        def on_token(token_id):
+            token_ids.put(token_id)
+            return should_stop()
+        future = self.scheduler.submit(user_input, on_token, priority, session_id, context)
+        future.add_done_callback(lambda _: token_ids.put(None))
+        while True:
+            token_id = token_ids.get()
+            if token_id is None:
+                break
+            yield token_id
+        future.result()
+
+    # Yield the SQL decoded so far after every token.
+    # The decode stops when cancel_event is set or the caller closes the generator,
+    # which is what happens when a Streamlit rerun interrupts the consuming loop.
+    def generate_sql_stream(self, user_input, cancel_event=None, priority=INTERACTIVE, session_id=None, context=None):
+        closed = threading.Event()
+        def should_stop():
+            return closed.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+        token_stream = self._stream_token_ids(user_input, should_stop, priority, session_id, context)
+        token_ids = []
+        try:
+            for token_id in token_stream:
+                if should_stop():
+                    logging.info(f"SQL stream cancelled for input: {user_input}")
+                    break
+                token_ids.append(token_id)
+                yield extract_sql(self.tokenizer.decode(token_ids, skip_special_tokens=True))
+        except Exception as e:
+            logging.error(f"Error streaming SQL: {str(e)}")
+            raise
+        finally:
+            closed.set()
+            token_stream.close()
@@ -0,0 +1,40 @@
+import os
+from feedback_log import FeedbackLog
+
+def make_log(tmp_path, grace_seconds=0):
+    return FeedbackLog(str(tmp_path / "events.jsonl"), str(tmp_path / "counts.json"), grace_seconds=grace_seconds)
+
+def test_votes_survive_compaction(tmp_path):
+    log = make_log(tmp_path)
+    log.record("a", "upvote")
+    log.record("a", "upvote")
+    log.record("b", "downvote")
+    assert log.compact() == 3
+    log.record("a", "downvote")
+    assert log.counts() == {"a": {"upvote": 2, "downvote": 1}, "b": {"upvote": 0, "downvote": 1}}
+    assert log._segments() == []
+
+def test_segment_waits_out_the_grace_period(tmp_path):
+    log = make_log(tmp_path, grace_seconds=60)
+    log.record("a", "upvote")
+    assert log.compact() == 0
+    assert len(log._segments()) == 1
+    # Still counted while it waits
+    assert log.counts() == {"a": {"upvote": 1, "downvote": 0}}
+    log.grace_seconds = 0
+    assert log.compact() == 1
+    assert log._segments() == []
+    assert log.counts() == {"a": {"upvote": 1, "downvote": 0}}
+
+def test_recreated_log_with_the_same_inode_is_read_from_the_start(tmp_path):
+    log = make_log(tmp_path)
+    log.record("a", "upvote")
+    assert log.counts() == {"a": {"upvote": 1, "downvote": 0}}
+    # Rewrite the file in place, as a new log that was given the old inode would look
+    with open(log.path, "r+b") as f:
+        f.truncate(0)
+    writer = make_log(tmp_path)
+    writer.record("b", "downvote")
+    writer.record("c", "upvote")
+    assert os.stat(log.path).st_ino == log._inode
+    assert log.counts() == {"b": {"upvote": 0, "downvote": 1}, "c": {"upvote": 1, "downvote": 0}}
@@ -0,0 +1,93 @@
+import os
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+import interaction_store
+from feedback_log import FeedbackLog
+from interaction_archive import InteractionArchive
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(interaction_store, "DB_FILE", str(tmp_path / "interactions.db"))
+    monkeypatch.setattr(interaction_store, "_conn", None)
+    monkeypatch.setattr(interaction_store, "_feedback",
+                        FeedbackLog(str(tmp_path / "events.jsonl"), str(tmp_path / "counts.json")))
+    yield interaction_store
+    interaction_store._conn.close()
+
+@pytest.fixture
+def archive(store, tmp_path):
+    return InteractionArchive(root=str(tmp_path / "archive"))
+
+def add(store, interaction_id, timestamp):
+    store.append_records([{"interaction_id": interaction_id, "timestamp": timestamp,
+                           "question": f"question {interaction_id}", "sql_query": f"SQL {interaction_id}"}])
+
+def tail_ids(store):
+    return [row[0] for row in store._connection().execute("SELECT interaction_id FROM interactions ORDER BY id")]
+
+def part_files(archive):
+    return sorted(os.path.join(os.path.basename(root), name)
+                  for root, _, names in os.walk(archive.root) for name in names)
+
+def test_roll_over_moves_only_finished_days(store, archive):
+    add(store, "a", "2024-01-01 09:00:00")
+    add(store, "b", "2024-01-01 17:00:00")
+    add(store, "c", "2024-01-02 12:00:00")
+    add(store, "d", "2024-01-03 08:00:00")
+    assert archive.roll_over(today="2024-01-03") == 3
+    assert tail_ids(store) == ["d"]
+    assert part_files(archive) == ["date=2024-01-01/part-000000000001-000000000002.parquet",
+                                   "date=2024-01-02/part-000000000003-000000000003.parquet"]
+
+def test_rows_added_during_a_roll_are_kept(store, archive, monkeypatch):
+    add(store, "a", "2024-01-01 09:00:00")
+    load_day = store.load_day
+    def load_day_then_insert(day, next_day):
+        loaded = load_day(day, next_day)
+        add(store, "late", "2024-01-01 23:59:59")
+        return loaded
+    monkeypatch.setattr(store, "load_day", load_day_then_insert)
+    assert archive.roll_over(today="2024-01-02") == 1
+    assert tail_ids(store) == ["late"]
+
+def test_second_roll_over_is_a_no_op(store, archive):
+    add(store, "a", "2024-01-01 09:00:00")
+    archive.roll_over(today="2024-01-02")
+    files = part_files(archive)
+    assert archive.roll_over(today="2024-01-02") == 0
+    assert part_files(archive) == files
+
+def test_late_row_for_an_archived_day_gets_its_own_part(store, archive):
+    add(store, "a", "2024-01-01 09:00:00")
+    archive.roll_over(today="2024-01-02")
+    # The table is empty now; the next row must not reuse rowid 1
+    add(store, "late", "2024-01-01 23:59:59")
+    assert archive.roll_over(today="2024-01-02") == 1
+    assert part_files(archive) == ["date=2024-01-01/part-000000000001-000000000001.parquet",
+                                   "date=2024-01-01/part-000000000002-000000000002.parquet"]
+    assert sorted(archive.load_data(columns=["interaction_id"])["interaction_id"]) == ["a", "late"]
+
+def test_roll_over_skips_while_another_process_holds_the_lock(store, archive):
+    add(store, "a", "2024-01-01 09:00:00")
+    open(archive.lock_path, "w").close()
+    assert archive.roll_over(today="2024-01-02") == 0
+    assert tail_ids(store) == ["a"]
+
+def test_load_data_reads_archive_and_tail(store, archive):
+    add(store, "a", "2024-01-01 09:00:00")
+    add(store, "b", "2024-01-02 12:00:00")
+    archive.roll_over(today="2024-01-03")
+    add(store, "c", "2024-01-03 08:00:00")
+    add(store, "d", "2024-01-04 08:00:00")
+    store.update_feedback("upvote", "b")
+    store.update_feedback("downvote", "c")
+
+    data = archive.load_data("2024-01-02", "2024-01-03", columns=["question", "upvote", "downvote"])
+    assert list(data.columns) == ["question", "upvote", "downvote"]
+    assert data.values.tolist() == [["question b", 1, 0], ["question c", 0, 1]]
+
+    everything = archive.load_data()
+    assert list(everything["interaction_id"]) == ["a", "b", "c", "d"]
+    assert list(everything["upvote"]) == [0, 1, 0, 0]
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("pandas")
+import interaction_store
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(interaction_store, "DB_FILE", str(tmp_path / "interactions.db"))
+    monkeypatch.setattr(interaction_store, "LEGACY_CSV_FILE", str(tmp_path / "interactions.csv"))
+    monkeypatch.setattr(interaction_store, "_conn", None)
+    yield interaction_store
+    interaction_store._conn.close()
+
+def row_count(store):
+    return store._connection().execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+
+def test_legacy_csv_is_imported_once(store):
+    with open(store.LEGACY_CSV_FILE, "w") as f:
+        f.write("timestamp,question,sql_query,upvote,downvote,session_id\n"
+                "2024-01-01 10:00:00,How many stadiums,SELECT COUNT(*) FROM stadium,0,0,s1\n"
+                "2024-01-02 11:00:00,List singers,SELECT name FROM singer,1,0,s2\n")
+    store.init_csv()
+    assert row_count(store) == 2
+    # Rolling over into the archive empties the table; the import must not repeat
+    store.delete_day("2024-01-01", "2024-01-03", 2)
+    assert row_count(store) == 0
+    store.init_csv()
+    assert row_count(store) == 0
+
+def test_database_from_before_the_marker_is_not_reimported(store):
+    store.append_records([{"timestamp": "2024-01-01 10:00:00", "question": "q", "sql_query": "SELECT 1"}])
+    conn = store._connection()
+    conn.execute("DELETE FROM meta")
+    conn.commit()
+    with open(store.LEGACY_CSV_FILE, "w") as f:
+        f.write("timestamp,question,sql_query\n2024-01-01 10:00:00,q,SELECT 1\n")
+    store.init_csv()
+    assert row_count(store) == 1
+
+def test_old_table_gets_an_autoincrement_id(store):
+    import sqlite3
+    conn = sqlite3.connect(store.DB_FILE)
+    conn.execute("CREATE TABLE interactions (interaction_id TEXT NOT NULL, timestamp TEXT, question TEXT, "
+                 "sql_query TEXT, result TEXT, upvote INTEGER DEFAULT 0, downvote INTEGER DEFAULT 0, session_id TEXT)")
+    conn.execute("INSERT INTO interactions (interaction_id, question) VALUES ('a', 'q1'), ('b', 'q2')")
+    conn.commit()
+    conn.close()
+    conn = store._connection()
+    assert conn.execute("SELECT id, interaction_id FROM interactions ORDER BY id").fetchall() == [(1, "a"), (2, "b")]
+    # Emptying the table, as rolling over does, must not hand out the same rowids again
+    conn.execute("DELETE FROM interactions")
+    conn.commit()
+    store.append_records([{"interaction_id": "c", "question": "q3"}])
+    assert conn.execute("SELECT id FROM interactions").fetchall() == [(3,)]
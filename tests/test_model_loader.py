@@ -0,0 +1,36 @@
+import threading
+from batch_scheduler import BatchScheduler
+from model_loader import ModelLoader
+
+def test_scheduler_close_wait_drains_queue():
+    scheduler = BatchScheduler(lambda inputs, on_tokens, contexts, sample=False: [q.upper() for q in inputs])
+    futures = [scheduler.submit(q) for q in ("a", "b", "c")]
+    scheduler.close(wait=True, timeout=5)
+    assert not scheduler._thread.is_alive()
+    assert [future.result(0) for future in futures] == ["A", "B", "C"]
+
+class SlowCloseGenerator:
+    def __init__(self, version):
+        self.version = version
+        self.closing = threading.Event()
+        self.release = threading.Event()
+
+    def generate_sql_batch(self, questions):
+        return questions
+
+    def close(self):
+        self.closing.set()
+        self.release.wait(5)
+
+def test_retire_does_not_block_the_releasing_thread():
+    loader = ModelLoader(SlowCloseGenerator, version="v1", warmup_questions=None)
+    with loader.acquire(timeout=5) as old:
+        loader.swap("v2")
+        for _ in range(500):
+            if loader.version == "v2":
+                break
+            threading.Event().wait(0.01)
+    # Leaving the lease returned without waiting for the slow close
+    assert old.closing.wait(5)
+    assert not old.release.is_set()
+    old.release.set()
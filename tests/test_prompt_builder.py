@@ -0,0 +1,46 @@
+import os
+
+from conversation import ConversationContext
+from prompt_builder import PromptBuilder, PromptTemplate
+
+PROMPT_TXT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Prompt.txt")
+SCHEMA = {"stadium": {"stadium_id": "number", "location": "text", "capacity": "number"}}
+
+# One token per character, enough to check what goes into each question slot
+class CharTokenizer:
+    bos_token = None
+    eos_token_id = 0
+
+    def encode(self, text, add_special_tokens=True):
+        return [ord(ch) for ch in text]
+
+    def tokenize(self, text):
+        return list(text)
+
+    def convert_ids_to_tokens(self, ids):
+        return [chr(i) for i in ids]
+
+    def convert_tokens_to_ids(self, token):
+        return 1
+
+def compiled_prompt():
+    builder = PromptBuilder(CharTokenizer(), PromptTemplate.from_file(PROMPT_TXT))
+    return builder, builder.compile(SCHEMA)
+
+def test_question_fills_every_slot():
+    builder, prompt = compiled_prompt()
+    question = "How many stadiums are there"
+    text = "".join(prompt.static_tokens + prompt.question_tokens(question))
+    assert text == builder.render(SCHEMA, question)
+    assert len(prompt.leads) == 3
+
+def test_follow_up_context_only_in_first_slot():
+    _, prompt = compiled_prompt()
+    context = ConversationContext.from_turns([("How many stadiums are there", "SELECT COUNT(*) FROM stadium;")])
+    question = "Only those in Paris"
+    tokens = prompt.question_tokens(question, context)
+    text = "".join(tokens)
+    assert text.count("Earlier SQL") == 1
+    assert text.count(question) == 3
+    context_length = len(context.tokens(prompt.tokenizer, prompt.leads[0]))
+    assert prompt.question_length(tokens, context_length) == prompt.question_length(prompt.question_tokens(question))
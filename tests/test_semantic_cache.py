@@ -0,0 +1,94 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from semantic_cache import SemanticCache
+
+# Labelled pairs the default threshold and max_unmatched are tuned on
+STORED = [
+    "Total revenue per category",
+    "How many stadiums are there",
+    "What is the average capacity of stadiums in each location",
+    "Show sales by month",
+    "Top 5 customers by revenue",
+    "Number of orders placed in 2023",
+    "Which products have never been ordered",
+    "Average order value per customer",
+    "Count of employees in each department",
+    "Show the stadium with the highest capacity",
+    "List customers from Germany",
+    "How many singers performed in each concert",
+    "How many customers do we have",
+]
+PARAPHRASES = [
+    ("Revenue by product category", 0),
+    ("What is the total revenue for each category", 0),
+    ("How many stadiums do we have", 1),
+    ("Number of stadiums", 1),
+    ("Average stadium capacity per location", 2),
+    ("Show me the mean capacity of stadiums by location", 2),
+    ("Monthly sales", 3),
+    ("Sales per month", 3),
+    ("Top 5 customers ranked by revenue", 4),
+    ("How many orders were placed in 2023", 5),
+    ("Orders count in 2023", 5),
+    ("Products that were never ordered", 6),
+    ("Average order value by customer", 7),
+    ("How many employees per department", 8),
+    ("Employee count by department", 8),
+    ("Stadium with the largest capacity", 9),
+    ("Customers in Germany", 10),
+    ("Number of singers in each concert", 11),
+    ("Number of customers", 12),
+    ("Which stadium has the biggest capacity", 9),
+]
+NON_PARAPHRASES = [
+    "Total revenue per region",
+    "Total cost per category",
+    "Show sales by week",
+    "Top 10 customers by revenue",
+    "Number of orders placed in 2022",
+    "How many singers are there",
+    "Which customers have never ordered",
+    "Average order value per product",
+    "Count of employees in each city",
+    "Show the stadium with the lowest capacity",
+    "List customers from France",
+    "How many concerts were held in each stadium",
+    # An added filter or negation asks for different SQL
+    "How many customers do we have in Europe",
+    "How many customers do we not have",
+    "How many customers don't we have",
+    "Which stadium has the highest capacity in Paris",
+    "How many stadiums are there in Paris",
+    "Show the stadium with the highest capacity in Paris",
+    "How many stadiums are not there",
+    "Which products have been ordered",
+    "List customers from Germany who never ordered",
+    "Show sales by month without returns",
+    "How many singers didn't perform in each concert",
+]
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "semantic_cache.npz"))
+    for i, question in enumerate(STORED):
+        cache.put("fp", question, f"SQL {i}")
+    return cache
+
+@pytest.mark.parametrize("question,stored", PARAPHRASES)
+def test_paraphrase_hits(cache, question, stored):
+    assert cache.get("fp", question) == f"SQL {stored}"
+
+@pytest.mark.parametrize("question", NON_PARAPHRASES)
+def test_non_paraphrase_misses(cache, question):
+    assert cache.get("fp", question) is None
+
+def test_other_prompt_misses(cache):
+    assert cache.get("other", STORED[0]) is None
+
+def test_saved_index_reloads(cache, tmp_path):
+    cache.save()
+    reloaded = SemanticCache(path=str(tmp_path / "semantic_cache.npz"))
+    assert reloaded.get("fp", "Revenue by product category") == "SQL 0"
+    assert [path.name for path in tmp_path.iterdir()] == ["semantic_cache.npz"]
@@ -0,0 +1,54 @@
+from sql_extract import extract_sql, is_complete_sql, SQLEndDetector
+
+class CharTokenizer:
+    def convert_tokens_to_string(self, tokens):
+        return "".join(tokens)
+
+# Feed text one character at a time; the decoded text when the detector reports the end
+def decode_until_complete(text):
+    detector = SQLEndDetector(CharTokenizer())
+    for i, ch in enumerate(text):
+        if detector.feed(ch):
+            return text[:i + 1]
+    return None
+
+def test_preamble_then_fence():
+    text = "Here is the SQL query:\n\n```sql\nSELECT COUNT(*) FROM stadium;\n```"
+    assert extract_sql(text) == "SELECT COUNT(*) FROM stadium;"
+    assert decode_until_complete(text) == "Here is the SQL query:\n\n```sql\nSELECT COUNT(*) FROM stadium;"
+
+def test_preamble_then_fence_without_semicolon():
+    text = "Here is the SQL query:\n```sql\nSELECT name FROM stadium\n```\nThis lists every stadium."
+    assert extract_sql(text) == "SELECT name FROM stadium"
+
+def test_fence_only():
+    text = "```sql\nSELECT name FROM stadium WHERE capacity > 5000;\n```"
+    assert extract_sql(text) == "SELECT name FROM stadium WHERE capacity > 5000;"
+
+def test_bare_statement():
+    text = "SELECT location, AVG(capacity) FROM stadium GROUP BY location;\nThis groups by location."
+    assert extract_sql(text) == "SELECT location, AVG(capacity) FROM stadium GROUP BY location;"
+
+def test_bare_statement_then_closing_fence():
+    assert extract_sql("SELECT name FROM stadium\n```") == "SELECT name FROM stadium"
+
+def test_apostrophe_in_preamble():
+    text = "Here's the query: SELECT name FROM stadium WHERE location = 'Raith Rovers';"
+    assert extract_sql(text) == "SELECT name FROM stadium WHERE location = 'Raith Rovers';"
+    assert decode_until_complete(text) == text
+
+def test_semicolon_inside_string():
+    assert extract_sql("SELECT name FROM stadium WHERE name = 'a;b'; -- done") == "SELECT name FROM stadium WHERE name = 'a;b';"
+
+def test_incomplete_statement_keeps_decoding():
+    assert decode_until_complete("Here is the SQL query:\n\n```sql\nSELECT COUNT(*) FROM stadium") is None
+
+def test_text_without_sql_is_returned_whole():
+    assert extract_sql("I cannot answer that question.") == "I cannot answer that question."
+
+def test_complete_sql():
+    assert is_complete_sql("SELECT COUNT(*) FROM stadium;")
+    assert is_complete_sql("```sql\nSELECT COUNT(*) FROM stadium\n```")
+    # Cut off at the token budget
+    assert not is_complete_sql("SELECT name FROM stadium WHERE location = 'Par")
+    assert not is_complete_sql("SELECT name FROM stadium WHERE")
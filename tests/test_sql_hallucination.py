@@ -0,0 +1,36 @@
+from Sql_hallucination import extract_tables_and_columns, validate_sql_for_schema
+
+SCHEMA = {
+    "stadium": {"stadium_id": "number", "location": "text", "name": "text", "capacity": "number"},
+    "singer_in_concert": {"concert_id": "number", "singer_id": "text"},
+}
+
+def test_valid_query():
+    assert validate_sql_for_schema("SELECT name FROM stadium WHERE capacity > 5000", SCHEMA) == (True, [])
+
+def test_unknown_table_is_rejected():
+    assert validate_sql_for_schema("SELECT * FROM bar", SCHEMA) == (False, ["bar"])
+    assert validate_sql_for_schema("SELECT COUNT(*) FROM bar", SCHEMA) == (False, ["bar"])
+
+def test_unknown_column_is_rejected():
+    assert validate_sql_for_schema("SELECT height FROM stadium", SCHEMA) == (False, ["height"])
+
+def test_double_quoted_literal_is_not_a_column():
+    tables, columns = extract_tables_and_columns('SELECT name FROM stadium WHERE location = "Paris"')
+    assert (tables, columns) == (["stadium"], ["location", "name"])
+    assert validate_sql_for_schema('SELECT name FROM stadium WHERE location = "Paris"', SCHEMA) == (True, [])
+
+def test_cte_name_is_not_a_table():
+    sql = "WITH big AS (SELECT name, capacity FROM stadium WHERE capacity > 5000) SELECT name FROM big ORDER BY capacity"
+    assert extract_tables_and_columns(sql) == (["stadium"], ["capacity", "name"])
+    assert validate_sql_for_schema(sql, SCHEMA) == (True, [])
+
+def test_derived_table_alias_is_not_a_table():
+    sql = "SELECT sub.name FROM (SELECT name FROM stadium WHERE capacity > 5000) sub"
+    assert validate_sql_for_schema(sql, SCHEMA) == (True, [])
+    sql = "SELECT name FROM (SELECT name FROM stadium) AS sub JOIN singer_in_concert ON sub.name = singer_id"
+    assert validate_sql_for_schema(sql, SCHEMA) == (True, [])
+
+def test_unknown_table_inside_cte_is_rejected():
+    sql = "WITH big AS (SELECT name FROM arena) SELECT name FROM big"
+    assert validate_sql_for_schema(sql, SCHEMA)[0] is False